@@ -0,0 +1,206 @@
+"""In-process unified-diff applier used to validate and apply AI-generated patches."""
+
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("modx.patch")
+
+_HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+_DEV_NULL = '/dev/null'
+
+
+class PatchError(Exception):
+    """Raised when a diff is malformed or does not match the target file."""
+
+
+class _Hunk:
+    __slots__ = ('old_start', 'old_count', 'new_count', 'old', 'new', 'old_no_eol', 'new_no_eol')
+
+    def __init__(self, old_start: int, old_count: int = 1, new_count: int = 1):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_count = new_count
+        self.old: List[str] = []
+        self.new: List[str] = []
+        self.old_no_eol = False
+        self.new_no_eol = False
+
+
+def _header_path(line: str) -> Optional[str]:
+    path = line[4:].rstrip('\r\n').split('\t', 1)[0].strip()
+    if path == _DEV_NULL:
+        return None
+    if path.startswith(('a/', 'b/')):
+        path = path[2:]
+    return path
+
+
+def parse_unified(diff_text: str) -> List[Tuple[Optional[str], Optional[str], List[_Hunk]]]:
+    """Split ``diff_text`` into ``(old_path, new_path, hunks)`` per file section.
+
+    Hunk line counts in the ``@@`` header are not trusted (model output often
+    gets them wrong); a hunk runs until the next hunk or file header, or until
+    a blank line once the header's counts are used up.
+    """
+    lines = diff_text.splitlines()
+    files = []
+    hunk = None
+    last_kind = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('--- ') and i + 1 < len(lines) and lines[i + 1].startswith('+++ '):
+            files.append((_header_path(line), _header_path(lines[i + 1]), []))
+            hunk = None
+            i += 2
+            continue
+        m = _HUNK_RE.match(line)
+        if m:
+            if not files:
+                raise PatchError('hunk before file header')
+            hunk = _Hunk(int(m.group(1)),
+                         int(m.group(2)) if m.group(2) is not None else 1,
+                         int(m.group(4)) if m.group(4) is not None else 1)
+            files[-1][2].append(hunk)
+            last_kind = None
+        elif hunk is not None:
+            if line.startswith('\\'):
+                # "\ No newline at end of file" applies to the preceding line
+                if last_kind in ('-', ' '):
+                    hunk.old_no_eol = True
+                if last_kind in ('+', ' '):
+                    hunk.new_no_eol = True
+            elif not line and len(hunk.old) >= hunk.old_count and len(hunk.new) >= hunk.new_count:
+                # A separator after a complete hunk, not an empty context line
+                hunk = None
+            else:
+                kind, body = (line[:1] or ' '), line[1:]
+                if kind == ' ':
+                    hunk.old.append(body)
+                    hunk.new.append(body)
+                elif kind == '-':
+                    hunk.old.append(body)
+                elif kind == '+':
+                    hunk.new.append(body)
+                else:
+                    # Trailing prose after the last hunk ends the section
+                    hunk = None
+                    continue
+                last_kind = kind
+        i += 1
+    if not files:
+        raise PatchError('no file headers found')
+    return files
+
+
+def _find_block(lines: List[str], block: List[str], expected: int, start: int) -> int:
+    """Return the index where ``block`` matches ``lines``, searching outward from ``expected``."""
+    if not block:
+        return min(max(expected, start), len(lines))
+    last = len(lines) - len(block)
+    if last < start:
+        return -1
+    expected = min(max(expected, start), last)
+    for compare in (lambda a, b: a == b, lambda a, b: a.rstrip() == b.rstrip()):
+        for delta in range(0, max(expected - start, last - expected) + 1):
+            for pos in (expected - delta, expected + delta) if delta else (expected,):
+                if start <= pos <= last and all(compare(lines[pos + k], block[k]) for k in range(len(block))):
+                    return pos
+    return -1
+
+
+def _apply_hunks(text: str, hunks: List[_Hunk]) -> str:
+    newline = '\r\n' if '\r\n' in text else '\n'
+    lines = text.replace('\r\n', '\n').split('\n')
+    eof_newline = True
+    if lines and lines[-1] == '':
+        lines.pop()
+    elif text:
+        eof_newline = False
+
+    offset = 0
+    start = 0
+    for hunk in hunks:
+        # A pure insertion's old_start is the line it goes after, not the first line it replaces
+        expected = (hunk.old_start if not hunk.old else max(hunk.old_start - 1, 0)) + offset
+        pos = _find_block(lines, hunk.old, expected, start)
+        if pos < 0:
+            raise PatchError(f'hunk @@ -{hunk.old_start} does not match')
+        end = pos + len(hunk.old)
+        touches_eof = end == len(lines)
+        lines[pos:end] = hunk.new
+        offset += len(hunk.new) - len(hunk.old)
+        start = pos + len(hunk.new)
+        if touches_eof:
+            if hunk.new_no_eol:
+                eof_newline = False
+            elif hunk.old_no_eol:
+                eof_newline = True
+
+    if not lines:
+        return ''
+    return newline.join(lines) + (newline if eof_newline else '')
+
+
+def _safe_target(root: Path, rel: str) -> Path:
+    norm = os.path.normpath(rel)
+    if os.path.isabs(norm) or norm == '..' or norm.startswith('..' + os.sep):
+        raise PatchError(f'path escapes the work tree: {rel}')
+    return root / norm
+
+
+def apply_unified(diff_text: str, root: Path, check_only: bool = False) -> Tuple[bool, Dict[str, Optional[str]]]:
+    """Apply a (possibly multi-file) unified diff to files under ``root``.
+
+    Every hunk is matched in memory first; nothing is written unless the whole
+    diff applies. Returns ``(ok, new_files)`` where ``new_files`` maps each
+    touched relative path to its new text (``None`` for deletions). With
+    ``check_only`` the result is computed but not written.
+    """
+    try:
+        sections = parse_unified(diff_text)
+        new_files: Dict[str, Optional[str]] = {}
+        for old_path, new_path, hunks in sections:
+            if old_path is None and new_path is None:
+                raise PatchError('both sides of a file header are /dev/null')
+            src = old_path if old_path is not None else new_path
+            if src in new_files:
+                if new_files[src] is None:
+                    raise PatchError(f'{src} was deleted earlier in the diff')
+                current = new_files[src]
+            else:
+                target = _safe_target(root, src)
+                if old_path is None:
+                    if target.exists():
+                        raise PatchError(f'{src} already exists')
+                    current = ''
+                else:
+                    if not target.is_file():
+                        raise PatchError(f'{src} does not exist')
+                    with open(target, 'r', encoding='utf-8', newline='') as f:
+                        current = f.read()
+            result = _apply_hunks(current, hunks)
+            if new_path is None:
+                new_files[src] = None
+            else:
+                _safe_target(root, new_path)
+                if old_path is not None and old_path != new_path:
+                    new_files[old_path] = None  # rename
+                new_files[new_path] = result
+    except (PatchError, OSError, UnicodeDecodeError) as e:
+        logger.info("Patch rejected: %s", e)
+        return False, {}
+
+    if not check_only:
+        for rel, content in new_files.items():
+            target = _safe_target(root, rel)
+            if content is None:
+                target.unlink()
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+    return True, new_files
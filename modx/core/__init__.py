@@ -5,11 +5,12 @@ This module re-exports the main core classes so callers can import from
 """
 
 from .analyzer import CodebaseAnalyzer
-from .planner import ModernizationPlanner
+from .planner import ModernizationPlanner, Plan
 from .migrators.base import CodeMigrator
 
 __all__ = [
 	"CodebaseAnalyzer",
 	"ModernizationPlanner",
+	"Plan",
 	"CodeMigrator",
 ]
@@ -2,11 +2,59 @@
 import os
 import json
 import yaml
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from ..ai import AIModernizer
 
 
+LANGUAGE_EXTENSIONS = {
+    "python": (".py", ".pyw"),
+    "javascript": (".js", ".jsx"),
+    "typescript": (".ts", ".tsx"),
+    "java": (".java",),
+    "golang": (".go",)
+}
+COUNTED_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.go', '.jsx', '.tsx')
+
+
+def list_files(root: Path, stats: Optional[Dict[str, os.stat_result]] = None) -> List[str]:
+    """Every file under ``root`` as a POSIX path relative to it, sorted.
+
+    Pass a dict as ``stats`` to also collect each file's ``os.stat`` result.
+    """
+    files = []
+    for dirpath, _dirs, names in os.walk(root):
+        rel_root = Path(dirpath).relative_to(root)
+        for name in names:
+            rel = (rel_root / name).as_posix()
+            if stats is not None:
+                stats[rel] = os.stat(os.path.join(dirpath, name))
+            files.append(rel)
+    files.sort()
+    return files
+
+
+def select_files(files: List[str]) -> Tuple[Dict[str, List[str]], List[str], int]:
+    """Pick what analysis looks at from ``list_files()`` output.
+
+    Returns ``(languages, issue_candidates, total_files)``: up to five sample
+    files per language, the first ten ``.py`` files plus a top-level
+    ``package.json`` to scan for outdated issues, and the source file count.
+    Full and incremental analysis both go through here so they agree.
+    """
+    languages = {}
+    for lang, exts in LANGUAGE_EXTENSIONS.items():
+        matched = [f for f in files if f.endswith(exts)]
+        if matched:
+            languages[lang] = matched[:5]
+    total_files = sum(1 for f in files if f.endswith(COUNTED_EXTENSIONS))
+    candidates = [f for f in files if f.endswith(".py")][:10]
+    if "package.json" in files:
+        candidates.append("package.json")
+    return languages, candidates, total_files
+
+
 class CodebaseAnalyzer:
     def __init__(self, root_path: str = ".", use_ai: bool = True) -> None:
         self.root_path = Path(root_path)
@@ -14,16 +62,42 @@ class CodebaseAnalyzer:
         self.ai_modernizer = AIModernizer() if use_ai else None
 
     def analyze(self) -> Dict:
+        languages, candidates, total_files = select_files(list_files(self.root_path))
+        issues_by_file = self.analyze_files(candidates)
+        outdated_issues = [issue for rel in candidates for issue in issues_by_file[rel]]
+        return self.assemble_findings(languages, self._detect_frameworks(), outdated_issues, total_files)
+
+    def analyze_files(self, paths) -> Dict[str, List[Dict]]:
+        """Scan only ``paths`` (relative to the root) for outdated issues.
+
+        Used by incremental planning to re-check just the files that changed.
+        """
+        results = {}
+        for rel in paths:
+            full_path = self.root_path / rel
+            if Path(rel).name == "package.json":
+                results[rel] = self._package_json_issues(full_path, rel)
+            elif str(rel).endswith(".py"):
+                issue = self._python_print_issue(full_path, rel)
+                results[rel] = [issue] if issue else []
+            else:
+                results[rel] = []
+        return results
+
+    def assemble_findings(self, languages: Dict[str, List[str]], frameworks: Dict[str, str],
+                          outdated_issues: List[Dict], total_files: int) -> Dict:
         findings = {
-            "languages": self._detect_languages(),
-            "frameworks": self._detect_frameworks(),
-            "outdated_issues": self._detect_outdated_issues(),
+            "languages": languages,
+            "language_set": frozenset(languages),
+            "frameworks": frameworks,
+            "outdated_issues": outdated_issues,
+            "outdated_issues_by_type": self._bucket_issues(outdated_issues),
             "summary": {},
             "service_path": str(self.root_path)
         }
 
         findings["summary"] = {
-            "total_files": self._count_files(),
+            "total_files": total_files,
             "languages_detected": list(findings["languages"].keys()),
             "frameworks_detected": list(findings["frameworks"].keys()),
             "issues_found": len(findings["outdated_issues"])
@@ -35,24 +109,11 @@ class CodebaseAnalyzer:
 
         return findings
 
-    def _detect_languages(self) -> Dict[str, List[str]]:
-        languages = {}
-        extensions = {
-            "python": [".py", ".pyw"],
-            "javascript": [".js", ".jsx"],
-            "typescript": [".ts", ".tsx"],
-            "java": [".java"],
-            "golang": [".go"]
-        }
-
-        for lang, exts in extensions.items():
-            files = []
-            for ext in exts:
-                files.extend(list(self.root_path.rglob(f"*{ext}")))
-            if files:
-                languages[lang] = [str(f.relative_to(self.root_path)) for f in files[:5]]
-
-        return languages
+    def _bucket_issues(self, issues: List[Dict]) -> Dict[str, List[Dict]]:
+        by_type = defaultdict(list)
+        for issue in issues:
+            by_type[issue["type"]].append(issue)
+        return dict(by_type)
 
     def _detect_frameworks(self) -> Dict[str, str]:
         frameworks = {}
@@ -92,44 +153,33 @@ class CodebaseAnalyzer:
 
         return frameworks
 
-    def _detect_outdated_issues(self) -> List[Dict]:
+    def _python_print_issue(self, py_file: Path, rel: str) -> Optional[Dict]:
+        try:
+            with open(py_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+                if "print " in content and "from __future__ import print_function" not in content:
+                    return {
+                        "file": rel,
+                        "type": "python2_print",
+                        "message": "Uses Python 2 style print statement"
+                    }
+        except:
+            pass
+        return None
+
+    def _package_json_issues(self, pkg_path: Path, rel: str) -> List[Dict]:
         issues = []
-
-        py_files = list(self.root_path.rglob("*.py"))
-        for py_file in py_files[:10]:
-            try:
-                with open(py_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if "print " in content and "from __future__ import print_function" not in content:
+        try:
+            with open(pkg_path) as f:
+                pkg = json.load(f)
+                deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
+                for dep, version in deps.items():
+                    if version.startswith("^0.") or version.startswith("~0."):
                         issues.append({
-                            "file": str(py_file.relative_to(self.root_path)),
-                            "type": "python2_print",
-                            "message": "Uses Python 2 style print statement"
+                            "file": rel,
+                            "type": "outdated_dependency",
+                            "message": f"Outdated dependency: {dep}@{version}"
                         })
-            except:
-                pass
-
-        pkg_path = self.root_path / "package.json"
-        if pkg_path.exists():
-            try:
-                with open(pkg_path) as f:
-                    pkg = json.load(f)
-                    deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
-                    for dep, version in deps.items():
-                        if version.startswith("^0.") or version.startswith("~0."):
-                            issues.append({
-                                "file": "package.json",
-                                "type": "outdated_dependency",
-                                "message": f"Outdated dependency: {dep}@{version}"
-                            })
-            except:
-                pass
-
+        except:
+            pass
         return issues
-
-    def _count_files(self) -> int:
-        extensions = ['.py', '.js', '.ts', '.java', '.go', '.jsx', '.tsx']
-        count = 0
-        for ext in extensions:
-            count += len(list(self.root_path.rglob(f"*{ext}")))
-        return count
@@ -1,11 +1,14 @@
 """CodeMigrator main class."""
 
 import os
+import sys
+import errno
+import hashlib
+import json
 import tempfile
 import shutil
-import difflib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import click
 import re
 from ..planner import ModernizationPlanner
@@ -16,8 +19,233 @@ from .java_migrator import JavaMigrator
 from .js_migrator import JSMigrator
 from .go_migrator import GoMigrator
 import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
-from .utils import BaseMigrator
+from .utils import BaseMigrator, fast_write, unified_diff, which
+from ..._patch import apply_unified
+
+
+_DEFAULT_DENY_DIRS = ('.pytest_cache', '__pycache__', '.venv', 'node_modules', 'dist', 'build')
+_SOURCE_EXTS = ('.py', '.js', '.ts', '.java', '.go')
+# pom.xml and package.json are covered by their suffixes
+# Deterministic handlers that only ever rewrite files with these suffixes
+_STEP_SOURCE_EXTS = {
+    'python_print_function': ('.py',),
+    'add_type_hints': ('.py',),
+    'es6_syntax': ('.js', '.ts'),
+}
+_PREVIEW_EXTS = frozenset(('.py', '.js', '.json', '.ts', '.java', '.go', '.xml'))
+_PREVIEW_NAMES = frozenset(('go.mod', 'requirements.txt'))
+# Files _apply_changes_to_original may copy back into the service
+_COPY_BACK_SUFFIXES = ('.py', '.js', '.ts', '.java', '.go', '.json', '.toml', '.md', '.ini', '.cfg', '.yml', '.yaml', '.xml', '.txt', '.mod')
+_COPY_BACK_NAMES = frozenset(('dockerfile', 'makefile'))
+
+
+_COMPARE_CHUNK = 64 * 1024
+
+
+def _same_content(src: Path, dst: Path) -> bool:
+    """Byte-compare two files, answering from the sizes alone when they differ."""
+    try:
+        size = src.stat().st_size
+        if size != dst.stat().st_size:
+            return False
+        if size < _COMPARE_CHUNK:
+            return src.read_bytes() == dst.read_bytes()
+        with open(src, 'rb') as a, open(dst, 'rb') as b:
+            while True:
+                block = a.read(_COMPARE_CHUNK)
+                if block != b.read(_COMPARE_CHUNK):
+                    return False
+                if not block:
+                    return True
+    except OSError:
+        return False
+
+
+def _move_file(src: Path, dst: Path):
+    """Rename ``src`` over ``dst``, copying instead when they are on different filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copy2(src, dst)
+        os.unlink(src)
+
+
+_COMPILE_CHUNK = 16
+_COMPILE_MAX_WORKERS = 8
+
+
+def _compile_one(item: Tuple[str, bytes]) -> Optional[str]:
+    """Compile one ``(path, source bytes)`` pair; return the error text, or ``None`` if it compiles."""
+    path, data = item
+    try:
+        # compile() decodes bytes itself, honouring a BOM or PEP 263 coding cookie
+        compile(data, path, 'exec')
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def _compile_all(items: List[Tuple[str, bytes]]) -> List[Optional[str]]:
+    """Syntax-check ``items`` across CPUs; small batches use threads to skip process start-up."""
+    if len(items) < 8:
+        with ThreadPoolExecutor(max_workers=max(1, len(items))) as ex:
+            return list(ex.map(_compile_one, items))
+    # Each worker gets at least one full chunk; beyond a few workers start-up outweighs the gain
+    workers = min(_COMPILE_MAX_WORKERS, os.cpu_count() or 1, -(-len(items) // _COMPILE_CHUNK))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(_compile_one, items, chunksize=_COMPILE_CHUNK))
+    except (OSError, BrokenProcessPool):
+        # No usable process pool here (e.g. sandboxed); compile in-process
+        return [_compile_one(item) for item in items]
+
+
+_SYNTAX_CACHE_PATH = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'modx' / 'syntax_cache.json'
+_SYNTAX_CACHE_MAX = 50000
+# Whether source compiles depends on the interpreter, so digests are keyed by its version
+_SYNTAX_CACHE_KEY = f'{sys.version_info[0]}.{sys.version_info[1]}'.encode()
+
+
+_FLAKE8_CODE_RE = re.compile(r'\b([A-Z]\d{3})\b')
+
+
+def _flake8_config(work_path: Path) -> Optional[Path]:
+    """The flake8 config a run from ``work_path`` would pick up, looked up the way flake8 does."""
+    for name in ('setup.cfg', 'tox.ini', '.flake8'):
+        cfg = work_path / name
+        try:
+            text = cfg.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue
+        if '[flake8]' in text or '[flake8:local-plugins]' in text:
+            return cfg
+    return None
+
+
+def _flake8_in_process(work_path: Path) -> Optional[Tuple[int, str]]:
+    """Run flake8 through its Python API; ``None`` when flake8 is not importable.
+
+    Returns ``(exit_code, report_text)``. Checks run with ``--jobs=1`` since the
+    point is to avoid process start-up, and the config is passed explicitly
+    because flake8 would otherwise search from this process's cwd.
+    """
+    try:
+        from flake8.main.application import Application
+    except ImportError:
+        return None
+
+    fd, out_path = tempfile.mkstemp(suffix='.flake8')
+    os.close(fd)
+    try:
+        cfg = _flake8_config(work_path)
+        argv = ['--jobs=1', f'--output-file={out_path}']
+        argv.append(f'--config={cfg}' if cfg else '--isolated')
+        app = Application()
+        try:
+            app.run(argv + [str(work_path)])
+        except SystemExit:
+            # argparse/config errors exit; let the caller fall back to the CLI
+            return None
+        with open(out_path, encoding='utf-8') as f:
+            return app.exit_code(), f.read().strip()
+    finally:
+        os.unlink(out_path)
+
+
+_PAGER_THRESHOLD = 1000
+_PYTEST_TAIL_LINES = 200
+
+
+# Line prefix -> ANSI color; the reset also ends the line
+_DIFF_COLORS = {'+': '\x1b[32m', '-': '\x1b[31m', '@': '\x1b[36m'}
+_RESET = '\x1b[0m\n'
+
+
+class _PagedOutput:
+    """Buffer output until it outgrows ``threshold`` characters, then stream everything through ``pager``."""
+
+    def __init__(self, pager: Optional[str], threshold: int = _PAGER_THRESHOLD):
+        self.pager = pager
+        self.threshold = threshold
+        self.buf: List[str] = []
+        self.size = 0
+        self.proc = None
+
+    def write(self, text: str):
+        if self.proc is not None:
+            if self.proc.stdin is not None:
+                try:
+                    self.proc.stdin.write(text)
+                except OSError:
+                    # The user quit the pager early; drop the rest
+                    self.proc.stdin = None
+            return
+        self.buf.append(text)
+        self.size += len(text)
+        if self.pager and self.size > self.threshold:
+            try:
+                self.proc = subprocess.Popen([self.pager, '-R'], stdin=subprocess.PIPE, text=True)
+            except OSError:
+                self.pager = None
+                return
+            pending, self.buf = self.buf, []
+            for chunk in pending:
+                self.write(chunk)
+
+    def close(self):
+        if self.proc is None:
+            for chunk in self.buf:
+                click.echo(chunk, nl=False)
+            self.buf = []
+            return
+        if self.proc.stdin is not None:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+        self.proc.wait()
+
+
+_TOP_LEVEL_DEF_RE = re.compile(r'^(?:async )?def ', re.M)
+
+
+def _space_top_level_defs(text: str) -> str:
+    """Ensure two blank lines above every top-level def; returns ``text`` itself when nothing changes.
+
+    Inserted lines use the file's own line ending (CRLF if it has any).
+    """
+    newline = '\r\n' if '\r\n' in text else '\n'
+    parts = []
+    last = 0
+    for m in _TOP_LEVEL_DEF_RE.finditer(text):
+        # Walk back over at most two blank lines directly above the def
+        pos = m.start()
+        blank = 0
+        while blank < 2 and pos > 0:
+            prev_start = text.rfind('\n', 0, pos - 1) + 1
+            if text[prev_start:pos - 1].strip():
+                break
+            blank += 1
+            pos = prev_start
+        if blank < 2:
+            parts.append(text[last:pos])
+            parts.append(newline * (2 - blank))
+            last = pos
+    if not parts:
+        return text
+    parts.append(text[last:])
+    new = ''.join(parts)
+    return new if new.endswith('\n') else new + newline
+
+
+def _needs_retry(diff_text: str) -> bool:
+    return not diff_text or diff_text.strip() == 'NO_DIFF_AVAILABLE' or not diff_text.lstrip().startswith('---')
 
 
 class CodeMigrator(BaseMigrator):
@@ -30,10 +258,18 @@ class CodeMigrator(BaseMigrator):
         self.java_migrator = JavaMigrator()
         self.js_migrator = JSMigrator()
         self.go_migrator = GoMigrator()
+        self._text_cache: Dict[Path, Tuple[int, int, str]] = {}
+        self._source_files: Dict[str, List[Path]] = {}
+        self._candidate_files: Optional[List[str]] = None
+        self._attempt_log = None
+        self._last_diff: Dict[str, Tuple[int, int, str, List[str]]] = {}
+        self._syntax_cache: Optional[Dict[str, bool]] = None
+        self._deny_dirs = self._load_deny_dirs()
 
     def migrate(self, interactive: bool = True, apply: bool = False) -> bool:
         # Use timezone-aware UTC timestamp
         self._audit_ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        self._text_cache = {}
         plan = self.planner.plan()
 
         if not plan['steps']:
@@ -43,8 +279,8 @@ class CodeMigrator(BaseMigrator):
         self._show_migration_summary(plan)
 
         self.temp_dir = Path(tempfile.mkdtemp())
-        shutil.copytree(self.service_path, self.temp_dir / "service")
         work_path = self.temp_dir / "service"
+        self._snapshot(self.service_path, work_path)
 
         changes = self._apply_changes_to_temp(work_path, plan)
 
@@ -52,10 +288,17 @@ class CodeMigrator(BaseMigrator):
             click.echo(click.style("❌ No changes were applied.", fg='red'))
             return False
 
-        self._show_colorized_diff(self.service_path, work_path, changes, plan)
+        shown = self._show_colorized_diff(self.service_path, work_path, changes, plan)
 
+        # None means unknown (the fixer failed part-way), so the final preview is re-rendered
+        whitespace_fixed = None
         try:
-            self._auto_fix_whitespace(work_path)
+            whitespace_fixed = self._auto_fix_whitespace(work_path)
+            for fixed in whitespace_fixed:
+                rel = str(fixed.relative_to(work_path))
+                orig_file = self.service_path / rel
+                if rel not in shown and orig_file.exists():
+                    shown[rel] = (self._read(orig_file), '')
         except Exception:
             pass
 
@@ -73,10 +316,13 @@ class CodeMigrator(BaseMigrator):
         if interactive:
             click.echo("")
             click.echo(click.style('Final changes to be applied:', fg='cyan', bold=True))
-            try:
-                self._show_colorized_diff(self.service_path, work_path, changes, plan)
-            except Exception:
-                pass
+            if whitespace_fixed == []:
+                click.echo("(unchanged from the preview above)")
+            else:
+                try:
+                    self._show_colorized_diff(self.service_path, work_path, changes, plan, precomputed=shown)
+                except Exception:
+                    pass
 
             response = click.prompt(
                 click.style("Changes validated successfully. Do you want to apply these to disk permanently? (y/n)", fg='yellow', bold=True),
@@ -103,6 +349,113 @@ class CodeMigrator(BaseMigrator):
             click.echo(click.style("ℹ️  Changes previewed but not applied.", fg='cyan'))
             return True
 
+    def _snapshot(self, src: Path, dst: Path):
+        """Copy the service tree into the sandbox as cheaply as the platform allows.
+
+        On Linux ``cp --reflink=auto`` shares extents on CoW filesystems (btrfs,
+        XFS) and degrades to a normal copy elsewhere; macOS uses ``cp -c`` (APFS
+        clones) and Windows a multithreaded robocopy. Symlinks are dereferenced,
+        like ``shutil.copytree``, so sandbox writes never reach the original.
+        """
+        if sys.platform.startswith('linux'):
+            cmd = ['cp', '-R', '-L', '--reflink=auto', '--preserve=mode,timestamps', str(src), str(dst)]
+        elif sys.platform == 'darwin':
+            cmd = ['cp', '-c', '-R', '-L', '-p', str(src), str(dst)]
+        elif os.name == 'nt':
+            cmd = ['robocopy', str(src), str(dst), '/E', '/MT:32', '/NFL', '/NDL', '/NJH', '/NJS', '/NP']
+        else:
+            cmd = None
+
+        if cmd:
+            try:
+                proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                # robocopy exit codes below 8 mean success
+                ok = proc.returncode < 8 if os.name == 'nt' else proc.returncode == 0
+                if ok:
+                    return
+            except OSError:
+                pass
+            shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst)
+
+    @staticmethod
+    def _walk_tree(root: Path, deny_dirs) -> Tuple[Dict[str, List[Path]], List[str]]:
+        """Walk ``root`` once, pruning denied directories.
+
+        Returns the source files bucketed by suffix, and the relative paths of
+        every file the diff preview considers.
+        """
+        found: Dict[str, List[Path]] = {ext: [] for ext in _SOURCE_EXTS}
+        previewable: List[str] = []
+        for dirpath, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in deny_dirs]
+            rel_dir = os.path.relpath(dirpath, root)
+            for name in files:
+                if name in deny_dirs:
+                    continue
+                ext = os.path.splitext(name)[1]
+                bucket = found.get(ext)
+                if bucket is not None:
+                    bucket.append(Path(dirpath, name))
+                if ext in _PREVIEW_EXTS or name in _PREVIEW_NAMES:
+                    previewable.append(name if rel_dir == '.' else os.path.join(rel_dir, name))
+        return found, previewable
+
+    def _load_deny_dirs(self) -> frozenset:
+        """Default skip list plus the directory entries (``name/``) of the service's .modxignore."""
+        deny_dirs = set(_DEFAULT_DENY_DIRS)
+        try:
+            modxignore = self.service_path / '.modxignore'
+            if modxignore.exists():
+                for line in modxignore.read_text().splitlines():
+                    l = line.strip()
+                    if not l or l.startswith('#'):
+                        continue
+                    if l.endswith('/'):
+                        deny_dirs.add(l[:-1])
+        except Exception:
+            pass
+        return frozenset(deny_dirs)
+
+    def _iter_py_files(self, root: Path) -> Iterator[Path]:
+        """Yield the .py files under ``root``, never descending into denied directories."""
+        for dirpath, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in self._deny_dirs]
+            for f in files:
+                if f.endswith('.py'):
+                    yield Path(dirpath) / f
+
+    def _load_syntax_cache(self) -> Dict[str, bool]:
+        """Digests of sources known to compile, loaded from disk on first use."""
+        if self._syntax_cache is None:
+            self._syntax_cache = {}
+            try:
+                with open(_SYNTAX_CACHE_PATH, encoding='utf-8') as f:
+                    self._syntax_cache = dict.fromkeys(json.load(f), True)
+            except Exception:
+                pass
+        return self._syntax_cache
+
+    def _save_syntax_cache(self):
+        try:
+            digests = list(self._syntax_cache)[-_SYNTAX_CACHE_MAX:]
+            _SYNTAX_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp = _SYNTAX_CACHE_PATH.with_suffix('.tmp')
+            tmp.write_text(json.dumps(digests), encoding='utf-8')
+            os.replace(tmp, _SYNTAX_CACHE_PATH)
+        except Exception:
+            pass
+
+    def _read(self, path: Path) -> str:
+        """Read ``path`` as UTF-8, reusing the text from earlier reads in this run while unchanged."""
+        st = path.stat()
+        hit = self._text_cache.get(path)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        text = path.read_text(encoding='utf-8')
+        self._text_cache[path] = (st.st_mtime_ns, st.st_size, text)
+        return text
+
     def _show_migration_summary(self, plan: Dict):
         click.echo("Migration Summary:")
         click.echo(f"Service: {plan['service']}")
@@ -117,25 +470,22 @@ class CodeMigrator(BaseMigrator):
             self._drop_step_logged = True
 
         changes: List[Dict] = []
-        deny_dirs = set(['.pytest_cache', '__pycache__', '.venv', 'node_modules', 'dist', 'build'])
-        try:
-            modxignore = self.service_path / '.modxignore'
-            if modxignore.exists():
-                for line in modxignore.read_text().splitlines():
-                    l = line.strip()
-                    if not l or l.startswith('#'):
-                        continue
-                    if l.endswith('/'):
-                        deny_dirs.add(l[:-1])
-        except Exception:
-            pass
+        deny_dirs = self._deny_dirs
+
+        # Substring checks against "/<dir>/" run in C, unlike a walk over Path.parts.
+        # Paths are normalized lexically rather than resolved: the snapshot
+        # dereferences symlinks, so ".." is the only way out of the work tree.
+        root_str = os.path.normpath(str(work_path))
+        denied_parts = tuple(f'{os.sep}{d}{os.sep}' for d in deny_dirs)
 
         def is_denied(p: Path) -> bool:
-            try:
-                rel = p.relative_to(work_path)
-            except Exception:
+            s = str(p)
+            if not s.startswith(root_str) or (len(s) > len(root_str) and s[len(root_str)] != os.sep):
                 return True
-            return any(part in deny_dirs for part in rel.parts)
+            s = s[len(root_str):] + os.sep
+            return any(d in s for d in denied_parts)
+
+        self._source_files, self._candidate_files = self._walk_tree(work_path, deny_dirs)
 
         ai_mod = None
         try:
@@ -157,13 +507,14 @@ class CodeMigrator(BaseMigrator):
                 '.json': 'json'
             }.get(ext, 'text')
 
+        made_dirs = set()
         for step in plan.get('steps', []):
             patch = step.get('patch')
             if isinstance(patch, dict) and patch:
                 for rel, content in patch.items():
-                    target = work_path / rel
+                    target = Path(os.path.normpath(work_path / rel))
                     try:
-                        if is_denied(target) or not str(target.resolve()).startswith(str(work_path.resolve())):
+                        if is_denied(target):
                             continue
                     except Exception:
                         continue
@@ -178,19 +529,26 @@ class CodeMigrator(BaseMigrator):
                         continue
 
                     old = None
-                    if target.exists():
+                    existed = target.exists()
+                    if existed:
                         try:
-                            old = target.read_text(encoding='utf-8')
+                            old = self._read(target)
                         except Exception:
                             old = None
-                    target.parent.mkdir(parents=True, exist_ok=True)
+                    if target.parent not in made_dirs:
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        made_dirs.add(target.parent)
                     try:
-                        target.write_text(content, encoding='utf-8')
+                        fast_write(target, content)
+                        self._text_cache.pop(target, None)
+                        if not existed:
+                            self._track_source_file(target)
                         self.record_change(target, 'ai_patch', old, content, changes, work_path)
                     except Exception:
                         continue
 
-        for step in plan.get('steps', []):
+        step_jobs = []
+        for idx, step in enumerate(plan.get('steps', [])):
             sid = step.get('id')
             targets = []
             if step.get('files_affected'):
@@ -199,7 +557,7 @@ class CodeMigrator(BaseMigrator):
                 targets = step.get('files')
             else:
                 if sid == 'es6_syntax':
-                    targets = [str(p.relative_to(work_path)) for p in work_path.rglob('*.js') if not is_denied(p)]
+                    targets = [str(p.relative_to(work_path)) for p in self._source_files['.js']]
                 elif sid == 'update_js_deps' or sid == 'update_dependencies':
                     if (work_path / 'package.json').exists():
                         targets = ['package.json']
@@ -209,23 +567,44 @@ class CodeMigrator(BaseMigrator):
                     if (work_path / 'go.mod').exists():
                         targets = ['go.mod']
                 elif sid == 'java_modernize':
-                    targets = [str(p.relative_to(work_path)) for p in work_path.rglob('*.java') if not is_denied(p)]
+                    targets = [str(p.relative_to(work_path)) for p in self._source_files['.java']]
 
             norm_targets = []
             for t in targets:
                 try:
-                    p = (work_path / t).resolve()
-                    if str(p).startswith(str(work_path.resolve())) and not is_denied(Path(p)):
-                        norm_targets.append(Path(p))
+                    p = Path(os.path.normpath(work_path / t))
+                    if not is_denied(p):
+                        norm_targets.append(p)
                 except Exception:
                     continue
+            step_jobs.append((idx, step, sid, targets, norm_targets))
 
+        ai_available = False
+        try:
+            ai_available = ai_mod is not None and ai_mod.is_available()
+        except Exception:
             ai_available = False
-            try:
-                ai_available = ai_mod is not None and ai_mod.is_available()
-            except Exception:
-                ai_available = False
 
+        # Request every step's diffs concurrently up front; applying stays sequential below
+        prefetched: Dict[Tuple[int, str], Tuple[str, str, str]] = {}
+        if ai_available:
+            tasks = []
+            for idx, step, sid, targets, norm_targets in step_jobs:
+                if any(not (self.service_path / f).exists() for f in targets):
+                    continue
+                for tgt in norm_targets:
+                    try:
+                        old = self._read(tgt) if tgt.exists() else ''
+                    except Exception:
+                        old = ''
+                    try:
+                        rel_path = str(tgt.relative_to(work_path))
+                    except Exception:
+                        rel_path = str(tgt.name)
+                    tasks.append(((idx, rel_path), old, rel_path, _lang_from_path(tgt), sid or step.get('title', 'modernize')))
+            prefetched = self._prefetch_ai_diffs(ai_mod, tasks)
+
+        for idx, step, sid, targets, norm_targets in step_jobs:
             # STRICT DROP_STEP ENFORCEMENT: Check for non-existent files before attempting AI diff
             if ai_available and targets:
                 non_existent = []
@@ -238,9 +617,10 @@ class CodeMigrator(BaseMigrator):
 
             if ai_available:
                 changed_any = False
+                step_diffs: List[Tuple[str, str]] = []
                 for tgt in norm_targets:
                     try:
-                        old = tgt.read_text(encoding='utf-8') if tgt.exists() else ''
+                        old = self._read(tgt) if tgt.exists() else ''
                     except Exception:
                         old = ''
 
@@ -250,33 +630,17 @@ class CodeMigrator(BaseMigrator):
                     except Exception:
                         rel_path = str(tgt.name)
 
-                    try:
-                        diff_text = ai_mod.generate_modernization_diff(old, rel_path, lang, sid or step.get('title', 'modernize'), minimal=False)
-                    except Exception:
-                        diff_text = ''
+                    hit = prefetched.get((idx, rel_path))
+                    if hit is not None and hit[0] == old:
+                        diff_text, diff_text2 = hit[1], hit[2]
+                    else:
+                        # An earlier step rewrote the file since the prefetch; ask again
+                        diff_text, diff_text2 = self._generate_ai_diff(ai_mod, old, rel_path, lang, sid or step.get('title', 'modernize'))
 
-                    try:
-                        ts = getattr(self, '_audit_ts', datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ'))
-                        art_dir = self.temp_dir / '.modx_artifacts' / 'ai_diffs' / ts
-                        art_dir.mkdir(parents=True, exist_ok=True)
-                        attempt_path = art_dir / f'step_{sid}_attempt_1.diff'
-                        attempt_path.write_text(diff_text or '', encoding='utf-8')
-                    except Exception:
-                        pass
+                    self._log_attempt(sid, rel_path, 1, diff_text)
 
-                    if not diff_text or diff_text.strip() == 'NO_DIFF_AVAILABLE' or not diff_text.lstrip().startswith('---'):
-                        try:
-                            diff_text2 = ai_mod.generate_modernization_diff(old, rel_path, lang, sid or step.get('title', 'modernize'), minimal=True)
-                        except Exception:
-                            diff_text2 = ''
-                        try:
-                            ts = getattr(self, '_audit_ts', datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ'))
-                            art_dir = self.temp_dir / '.modx_artifacts' / 'ai_diffs' / ts
-                            art_dir.mkdir(parents=True, exist_ok=True)
-                            attempt_path = art_dir / f'step_{sid}_attempt_2.diff'
-                            attempt_path.write_text(diff_text2 or '', encoding='utf-8')
-                        except Exception:
-                            pass
+                    if _needs_retry(diff_text):
+                        self._log_attempt(sid, rel_path, 2, diff_text2)
 
                         if diff_text2 and diff_text2.lstrip().startswith('---') and '+++' in diff_text2:
                             diff_text = diff_text2
@@ -285,54 +649,10 @@ class CodeMigrator(BaseMigrator):
                         click.echo(click.style(f"AI did not produce a valid unified diff for {rel_path}; falling back.", fg='yellow'))
                         continue
 
-                    try:
-                        chk = subprocess.run(['git', 'apply', '--directory', str(work_path), '--check', '-'], input=diff_text, text=True, capture_output=True)
-                        if chk.returncode != 0:
-                            click.echo(click.style(f"AI diff failed git apply --check for {rel_path}; falling back.\n{chk.stderr or chk.stdout}", fg='yellow'))
-                            continue
-                    except FileNotFoundError:
-                        click.echo(click.style("git not available to validate AI diff; falling back to deterministic handlers.", fg='yellow'))
-                        continue
+                    step_diffs.append((rel_path, diff_text))
 
-                    try:
-                        ap = subprocess.run(['git', 'apply', '--directory', str(work_path), '-'], input=diff_text, text=True, capture_output=True)
-                        if ap.returncode != 0:
-                            click.echo(click.style(f"git apply failed for {rel_path}: {ap.stderr or ap.stdout}", fg='red'))
-                            continue
-
-                        changed_files = []
-                        for line in diff_text.splitlines():
-                            if line.startswith('+++ '):
-                                p = line[4:].strip()
-                                if p.startswith('b/'):
-                                    p = p[2:]
-                                changed_files.append(p)
-
-                        # STRICT DROP_STEP: If diff affects zero real files, skip step
-                        real_affected = [f for f in changed_files if (self.service_path / f).exists()]
-                        if not real_affected:
-                            click.echo(f"⚠️ Skipped AI step \"{sid}\" — referenced non-existent file(s): {', '.join(changed_files)} (Strict safety: DROP_STEP)")
-                            continue
-
-                        for cf in changed_files:
-                            tgt_path = work_path / cf
-                            try:
-                                new = tgt_path.read_text(encoding='utf-8') if tgt_path.exists() else ''
-                            except Exception:
-                                new = ''
-                            orig_path = self.service_path / cf
-                            try:
-                                orig = orig_path.read_text(encoding='utf-8') if orig_path.exists() else ''
-                            except Exception:
-                                orig = ''
-                            try:
-                                self.record_change(tgt_path, f'ai_{sid or "patch"}', orig, new, changes, work_path)
-                            except Exception:
-                                pass
-                        changed_any = True
-                    except Exception as e:
-                        click.echo(click.style(f"Error applying AI diff for {rel_path}: {e}", fg='red'))
-                        continue
+                if step_diffs:
+                    changed_any = self._apply_ai_diffs(sid, step_diffs, work_path, changes)
 
                 if changed_any:
                     continue
@@ -346,246 +666,374 @@ class CodeMigrator(BaseMigrator):
                 'java_modernize': self.java_migrator,
                 'go_modules': self.go_migrator,
             }
+            exts = _STEP_SOURCE_EXTS.get(sid)
+            if exts and not any(self._source_files.get(ext) for ext in exts):
+                continue  # nothing in the tree for this handler to touch
             if sid in migrator_map:
-                changes.extend(migrator_map[sid].handle_step(sid, work_path, norm_targets, changes, self.service_path))
+                changes.extend(migrator_map[sid].handle_step(sid, work_path, norm_targets, changes, self.service_path, files=self._source_files))
 
-        seen = set()
-        final_changes: List[Dict] = []
+        self._close_attempt_log()
+
+        by_file: Dict[Optional[str], Dict] = {}
         for c in changes:
             f = c.get('file')
-            if f in seen:
-                for ex in final_changes:
-                    if ex.get('file') == f:
-                        ex['lines_changed'] = max(ex.get('lines_changed', 0), c.get('lines_changed', 0))
-                        break
+            prev = by_file.get(f)
+            if prev is None:
+                by_file[f] = c
             else:
-                seen.add(f)
-                final_changes.append(c)
+                prev['lines_changed'] = max(prev.get('lines_changed', 0), c.get('lines_changed', 0))
 
-        return final_changes
+        return list(by_file.values())
 
-    def _show_colorized_diff(self, original_path: Path, modified_path: Path, changes: Optional[List[Dict]] = None, plan: Optional[Dict] = None):
-        click.echo("Changes Preview:")
-        exts = ['*.py', '*.js', '*.json', '*.ts', '*.java', '*.go', '*.xml', 'pom.xml', 'package.json', 'go.mod', 'requirements.txt']
-        candidates = []
-        for pat in exts:
-            candidates.extend(list(original_path.rglob(pat)))
-
-        full_output_lines = []
-        seen_files = set()
-        change_map = {}
-        if changes:
-            for c in changes:
-                change_map.setdefault(c.get('file'), []).append(c.get('type'))
-
-        for orig_file in candidates:
+    def _log_attempt(self, sid: Optional[str], rel_path: str, attempt: int, diff_text: str):
+        """Append one AI attempt to ``attempts.jsonl`` in this run's artifact directory."""
+        try:
+            if self._attempt_log is None:
+                ts = getattr(self, '_audit_ts', datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ'))
+                art_dir = self.temp_dir / '.modx_artifacts' / 'ai_diffs' / ts
+                art_dir.mkdir(parents=True, exist_ok=True)
+                self._attempt_log = open(art_dir / 'attempts.jsonl', 'ab')
+            record = {'sid': sid, 'file': rel_path, 'attempt': attempt, 'diff': diff_text or ''}
+            self._attempt_log.write(json.dumps(record).encode('utf-8') + b'\n')
+        except Exception:
+            pass
+
+    def _close_attempt_log(self):
+        if self._attempt_log is not None:
             try:
-                rel_path = orig_file.relative_to(original_path)
+                self._attempt_log.close()
             except Exception:
-                continue
-            if str(rel_path) in seen_files:
-                continue
-            seen_files.add(str(rel_path))
+                pass
+            self._attempt_log = None
+
+    def _generate_ai_diff(self, ai_mod, old: str, rel_path: str, lang: str, label: str) -> Tuple[str, str]:
+        """Ask for a full diff, then a minimal one if the first is unusable."""
+        try:
+            diff_text = ai_mod.generate_modernization_diff(old, rel_path, lang, label, minimal=False)
+        except Exception:
+            diff_text = ''
+        diff_text2 = ''
+        if _needs_retry(diff_text):
+            try:
+                diff_text2 = ai_mod.generate_modernization_diff(old, rel_path, lang, label, minimal=True)
+            except Exception:
+                diff_text2 = ''
+        return diff_text, diff_text2
+
+    def _prefetch_ai_diffs(self, ai_mod, tasks: List[Tuple]) -> Dict[Tuple[int, str], Tuple[str, str, str]]:
+        """Generate diffs for ``(key, old, rel_path, lang, label)`` tasks on a thread pool.
+
+        The first wave requests full diffs; a second wave retries with
+        ``minimal=True`` only for the tasks whose first answer was unusable.
+        """
+        if not tasks:
+            return {}
+
+        def _call(task, minimal):
+            _key, old, rel_path, lang, label = task
+            try:
+                return ai_mod.generate_modernization_diff(old, rel_path, lang, label, minimal=minimal)
+            except Exception:
+                return ''
+
+        with ThreadPoolExecutor(max_workers=min(8, len(tasks))) as ex:
+            first = list(ex.map(lambda t: _call(t, False), tasks))
+            retry = [i for i, d in enumerate(first) if _needs_retry(d)]
+            second = dict(zip(retry, ex.map(lambda i: _call(tasks[i], True), retry)))
+
+        return {t[0]: (t[1], first[i], second.get(i, '')) for i, t in enumerate(tasks)}
+
+    def _apply_ai_diffs(self, sid: Optional[str], diffs: List[Tuple[str, str]], work_path: Path, changes: List[Dict]) -> bool:
+        """Apply a step's ``(rel_path, diff_text)`` pairs as one batch, or one by one if the batch does not apply."""
+        # Each diff ends in exactly one newline, so no blank line separates them
+        ok, new_files = apply_unified(''.join(d.rstrip('\n') + '\n' for _, d in diffs), work_path)
+        if ok:
+            return self._record_ai_diff(sid, new_files, work_path, changes)
+
+        applied_any = False
+        for rel_path, diff_text in diffs:
+            try:
+                ok, new_files = apply_unified(diff_text, work_path)
+                if not ok:
+                    click.echo(click.style(f"AI diff did not apply cleanly for {rel_path}; falling back.", fg='yellow'))
+                    continue
+                if self._record_ai_diff(sid, new_files, work_path, changes):
+                    applied_any = True
+            except Exception as e:
+                click.echo(click.style(f"Error applying AI diff for {rel_path}: {e}", fg='red'))
+        return applied_any
+
+    def _track_source_file(self, path: Path):
+        """Add a file written after ``_walk_tree`` to its source bucket so later handlers see it."""
+        bucket = self._source_files.get(path.suffix)
+        if bucket is not None and path not in bucket:
+            bucket.append(path)
+
+    def _record_ai_diff(self, sid: Optional[str], new_files: Dict[str, Optional[str]], work_path: Path, changes: List[Dict]) -> bool:
+        changed_files = list(new_files)
+        for cf in changed_files:
+            cf_path = work_path / cf
+            self._text_cache.pop(cf_path, None)
+            if new_files[cf] is not None:
+                self._track_source_file(cf_path)
+
+        # STRICT DROP_STEP: If diff affects zero real files, skip step
+        real_affected = [f for f in changed_files if (self.service_path / f).exists()]
+        if not real_affected:
+            click.echo(f"⚠️ Skipped AI step \"{sid}\" — referenced non-existent file(s): {', '.join(changed_files)} (Strict safety: DROP_STEP)")
+            return False
+
+        for cf in changed_files:
+            tgt_path = work_path / cf
+            try:
+                new = self._read(tgt_path) if tgt_path.exists() else ''
+            except Exception:
+                new = ''
+            orig_path = self.service_path / cf
+            try:
+                orig = self._read(orig_path) if orig_path.exists() else ''
+            except Exception:
+                orig = ''
+            try:
+                self.record_change(tgt_path, f'ai_{sid or "patch"}', orig, new, changes, work_path)
+            except Exception:
+                pass
+        return True
+
+    def _show_colorized_diff(self, original_path: Path, modified_path: Path, changes: Optional[List[Dict]] = None, plan: Optional[Dict] = None,
+                             precomputed: Optional[Dict[str, Tuple[str, str]]] = None) -> Dict[str, Tuple[str, str]]:
+        """Print a colorized diff of every differing file and return ``{rel: (orig, mod)}`` for them.
 
+        With ``precomputed`` (a previous return value) only those files are
+        revisited: the originals are reused, and files whose modified side has
+        not been touched since the last render replay their cached diff.
+        """
+        click.echo("Changes Preview:")
+        if precomputed is None:
+            self._last_diff = {}
+        if precomputed is not None:
+            candidates = list(precomputed)
+        elif self._candidate_files is not None:
+            candidates = self._candidate_files
+        else:
+            candidates = self._walk_tree(original_path, _DEFAULT_DENY_DIRS)[1]
+
+        out = _PagedOutput(which('less'))
+        shown: Dict[str, Tuple[str, str]] = {}
+        # Files with at least one AI change ('ai_patch' included) get the AI label
+        ai_files = {c.get('file') for c in changes or () if (c.get('type') or '').startswith('ai_')}
+        if plan and plan.get('ai_fallback'):
+            fallback_label = "🔁 DETERMINISTIC FALLBACK (AI did not return actionable steps)"
+        else:
+            fallback_label = "🔁 DETERMINISTIC FALLBACK (AI DIFF INVALID OR UNAVAILABLE)"
+        ai_label = "🔧 AI-GENERATED PATCH (STRICT DIFF MODE)"
+
+        for rel in candidates:
+            rel_path = Path(rel)
+            orig_file = original_path / rel_path
             mod_file = modified_path / rel_path
-            if mod_file.exists():
-                try:
-                    with open(orig_file, 'r', encoding='utf-8') as f:
-                        orig_content = f.read()
-                    with open(mod_file, 'r', encoding='utf-8') as f:
-                        mod_content = f.read()
-
-                    if orig_content != mod_content:
-                        types = change_map.get(str(rel_path), [])
-                        label = None
-                        if any(t.startswith('ai_') or t == 'ai_patch' for t in types):
-                            label = "🔧 AI-GENERATED PATCH (STRICT DIFF MODE)"
-                        else:
-                            if plan and plan.get('ai_fallback'):
-                                label = "🔁 DETERMINISTIC FALLBACK (AI did not return actionable steps)"
-                            else:
-                                label = "🔁 DETERMINISTIC FALLBACK (AI DIFF INVALID OR UNAVAILABLE)"
-
-                        click.echo(click.style(f"File: {rel_path}", fg='yellow', bold=True))
-                        click.echo(click.style(label, fg='cyan'))
-                        diff = list(difflib.unified_diff(
-                            orig_content.splitlines(keepends=True),
-                            mod_content.splitlines(keepends=True),
-                            fromfile=str(rel_path),
-                            tofile=str(rel_path),
-                            lineterm=''
-                        ))
-
-                        for line in diff:
-                            if line.startswith('+') and not line.startswith('+++'):
-                                full_output_lines.append('\x1b[32m' + line + '\x1b[0m')
-                            elif line.startswith('-') and not line.startswith('---'):
-                                full_output_lines.append('\x1b[31m' + line + '\x1b[0m')
-                            elif line.startswith('@@'):
-                                full_output_lines.append('\x1b[36m' + line + '\x1b[0m')
-                            else:
-                                full_output_lines.append(line)
-                        full_output_lines.append('\n')
-                except Exception:
-                    pass
-        if full_output_lines:
             try:
-                pager = shutil.which('less')
-                if pager and sum(len(l) for l in full_output_lines) > 1000:
-                    proc = subprocess.Popen([pager, '-R'], stdin=subprocess.PIPE, text=True)
-                    proc.communicate(''.join(full_output_lines))
+                st = mod_file.stat()
+                cached = self._last_diff.get(rel) if precomputed is not None else None
+                if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    shown[rel] = precomputed[rel]
+                    out.write(click.style(f"File: {rel_path}", fg='yellow', bold=True) + '\n')
+                    out.write(click.style(cached[2], fg='cyan') + '\n')
+                    out.write(''.join(cached[3]))
+                    continue
+
+                if precomputed is not None:
+                    orig_content = precomputed[str(rel_path)][0]
+                elif _same_content(orig_file, mod_file):
+                    # Byte-identical: skip decoding and splitting both sides
+                    continue
                 else:
-                    for l in full_output_lines:
-                        click.echo(l, nl=False)
-            except Exception:
-                for l in full_output_lines:
-                    click.echo(l, nl=False)
+                    orig_content = self._read(orig_file)
+                mod_content = self._read(mod_file)
+            except (OSError, UnicodeDecodeError):
+                # Missing on either side, or not UTF-8 text
+                continue
+
+            if orig_content == mod_content:
+                continue
+
+            shown[str(rel_path)] = (orig_content, mod_content)
+            label = ai_label if str(rel_path) in ai_files else fallback_label
+
+            out.write(click.style(f"File: {rel_path}", fg='yellow', bold=True) + '\n')
+            out.write(click.style(label, fg='cyan') + '\n')
+            rendered = []
+            diff = unified_diff(
+                orig_content.splitlines(keepends=True),
+                mod_content.splitlines(keepends=True),
+                fromfile=str(rel_path),
+                tofile=str(rel_path),
+            )
+
+            # The two file headers come first and are never colored
+            rendered.append(next(diff, '') + '\n')
+            rendered.append(next(diff, '') + '\n')
+            for line in diff:
+                # A last line without EOL carries no line ending
+                body = line[:-1] if line[-1:] == '\n' else line
+                color = _DIFF_COLORS.get(line[:1])
+                rendered.append(f'{color}{body}{_RESET}' if color else f'{body}\n')
+            rendered.append('\n')
+            out.write(''.join(rendered))
+            self._last_diff[rel] = (st.st_mtime_ns, st.st_size, label, rendered)
+        out.close()
+        return shown
 
     def _run_validators(self, work_path: Path) -> bool:
         click.echo("Running validators...")
+        # The syntax stage may fork a process pool, which is only safe before other threads start
+        results = [self._syntax_stage(work_path)]
+        stages = (self._language_stage, self._pytest_stage, self._lint_stage)
+        # The remaining stages are independent (pytest and flake8 mostly wait on subprocesses),
+        # so run them together and print their output in the usual order afterwards.
+        with ThreadPoolExecutor(max_workers=len(stages)) as ex:
+            futures = [ex.submit(stage, work_path) for stage in stages]
+        results.extend(future.result() for future in futures)
         success = True
-        click.echo("- Checking Python syntax...")
-        py_files = list(work_path.rglob('*.py'))
+        for ok, output in results:
+            success = success and ok
+            for line in output:
+                click.echo(line)
+
+        if success:
+            click.echo(click.style('✅ All validators passed.', fg='green'))
+        else:
+            click.echo(click.style('❌ One or more validators failed.', fg='red'))
+
+        return bool(success)
+
+    def _syntax_stage(self, work_path: Path) -> Tuple[bool, List[str]]:
+        output = ["- Checking Python syntax..."]
+        py_files = list(self._iter_py_files(work_path))
         syntax_errors = []
+        cache = self._load_syntax_cache()
+        pending = []
         for p in py_files:
             try:
-                src = p.read_text(encoding='utf-8')
-                compile(src, str(p), 'exec')
-            except Exception as e:
+                data = p.read_bytes()
+            except OSError as e:
                 syntax_errors.append((p, e))
+                continue
+            digest = hashlib.blake2b(data, digest_size=16, key=_SYNTAX_CACHE_KEY).hexdigest()
+            if digest not in cache:
+                pending.append((p, data, digest))
+        results = _compile_all([(str(p), data) for p, data, _ in pending])
+        for (p, _, digest), err in zip(pending, results):
+            if err is None:
+                cache[digest] = True  # only successes are cached
+            else:
+                syntax_errors.append((p, err))
+        if any(err is None for err in results):
+            self._save_syntax_cache()
 
         if syntax_errors:
-            success = False
-            click.echo(click.style('❌ Syntax errors detected:', fg='red', bold=True))
+            output.append(click.style('❌ Syntax errors detected:', fg='red', bold=True))
             for p, e in syntax_errors:
-                click.echo(f"- {p.relative_to(work_path)}: {e}")
+                output.append(f"- {p.relative_to(work_path)}: {e}")
+        return not syntax_errors, output
 
+    def _language_stage(self, work_path: Path) -> Tuple[bool, List[str]]:
         # Post-validation for other languages
         from .utils import SafeAggressiveTransformer
 
-        # JavaScript/TypeScript validation
-        js_files = list(work_path.rglob('*.js')) + list(work_path.rglob('*.ts'))
-        if js_files:
-            click.echo("- Checking JavaScript/TypeScript syntax...")
-            transformer = SafeAggressiveTransformer(work_path, 'javascript')
-            if not transformer.run_post_validation():
-                success = False
-                click.echo(click.style('❌ JavaScript/TypeScript validation failed.', fg='red'))
-
-        # Java validation
-        java_files = list(work_path.rglob('*.java'))
-        if java_files:
-            click.echo("- Checking Java syntax...")
-            transformer = SafeAggressiveTransformer(work_path, 'java')
-            if not transformer.run_post_validation():
-                success = False
-                click.echo(click.style('❌ Java validation failed.', fg='red'))
-
-        # Go validation
-        go_files = list(work_path.rglob('*.go'))
-        if go_files:
-            click.echo("- Checking Go syntax...")
-            transformer = SafeAggressiveTransformer(work_path, 'go')
+        success = True
+        output: List[str] = []
+        checks = (
+            ('javascript', ('*.js', '*.ts'), "JavaScript/TypeScript"),
+            ('java', ('*.java',), "Java"),
+            ('go', ('*.go',), "Go"),
+        )
+        for language, patterns, name in checks:
+            if not any(next(work_path.rglob(pat), None) for pat in patterns):
+                continue
+            output.append(f"- Checking {name} syntax...")
+            transformer = SafeAggressiveTransformer(work_path, language)
             if not transformer.run_post_validation():
                 success = False
-                click.echo(click.style('❌ Go validation failed.', fg='red'))
+                output.append(click.style(f'❌ {name} validation failed.', fg='red'))
+        return success, output
 
+    def _pytest_stage(self, work_path: Path) -> Tuple[bool, List[str]]:
+        output: List[str] = []
         try:
-            pytest_bin = shutil.which('pytest')
-            if pytest_bin:
-                click.echo("- Running tests (pytest)...")
-                proc = subprocess.run([pytest_bin, '-q', '--maxfail=1'], cwd=str(work_path), capture_output=True, text=True)
-                if proc.returncode != 0:
-                    combined = ((proc.stdout or '') + '\n' + (proc.stderr or '')).strip()
-                    if proc.returncode == 5 or 'collected 0' in combined or 'no tests ran' in combined:
-                        click.echo("- No tests were collected (ok).")
-                    else:
-                        success = False
-                        click.echo(click.style('❌ Tests failed:', fg='red', bold=True))
-                        out = (proc.stdout or '').strip()
-                        err = (proc.stderr or '').strip()
-                        if out:
-                            click.echo(out)
-                        if err:
-                            click.echo(err)
-            else:
-                click.echo("- Skipping tests: pytest not installed.")
+            pytest_bin = which('pytest')
+            if not pytest_bin:
+                return True, ["- Skipping tests: pytest not installed."]
+            output.append("- Running tests (pytest)...")
+            # Read the merged stream as it is produced, keeping only the tail for the failure report
+            tail = deque(maxlen=_PYTEST_TAIL_LINES)
+            nothing_collected = False
+            with subprocess.Popen([pytest_bin, '-q', '--maxfail=1'], cwd=str(work_path), stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT, text=True, bufsize=1) as proc:
+                for line in proc.stdout:
+                    if not nothing_collected and ('collected 0' in line or 'no tests ran' in line):
+                        nothing_collected = True
+                    tail.append(line)
+            if proc.returncode != 0:
+                if proc.returncode == 5 or nothing_collected:
+                    output.append("- No tests were collected (ok).")
+                else:
+                    output.append(click.style('❌ Tests failed:', fg='red', bold=True))
+                    report = ''.join(tail).strip()
+                    if report:
+                        output.append(report)
+                    return False, output
+            return True, output
         except Exception as e:
-            success = False
-            click.echo(click.style(f'❌ Error running tests: {e}', fg='red'))
+            output.append(click.style(f'❌ Error running tests: {e}', fg='red'))
+            return False, output
 
+    def _lint_stage(self, work_path: Path) -> Tuple[bool, List[str]]:
+        output: List[str] = []
         try:
-            flake8 = shutil.which('flake8')
-            if flake8:
-                click.echo("- Running linter (flake8)...")
+            lint = _flake8_in_process(work_path)
+            flake8 = which('flake8') if lint is None else None
+            if lint is None and not flake8:
+                return True, ["- Skipping linter: flake8 not installed."]
+            output.append("- Running linter (flake8)...")
+            if lint is not None:
+                returncode, combined = lint
+            else:
                 proc = subprocess.run([flake8, str(work_path)], cwd=str(work_path), capture_output=True, text=True)
                 out = (proc.stdout or '').strip()
                 err = (proc.stderr or '').strip()
                 combined = '\n'.join([s for s in (out, err) if s])
-                if proc.returncode != 0:
-                    codes = re.findall(r"\b([A-Z]\d{3})\b", combined)
-                    if codes and all(c.startswith('E3') for c in codes):
-                        click.echo(click.style('⚠️ Style-only lint issues detected (non-blocking):', fg='yellow'))
-                        if combined:
-                            click.echo(combined)
-                    else:
-                        serious = False
-                        if any(c.startswith('F') for c in codes):
-                            serious = True
-                        if 'SyntaxError' in combined or 'Traceback' in combined or 'NameError' in combined or 'undefined name' in combined:
-                            serious = True
-
-                        if serious:
-                            success = False
-                            click.echo(click.style('❌ Lint issues found (flake8):', fg='red', bold=True))
-                            if combined:
-                                click.echo(combined)
-                        else:
-                            success = False
-                            click.echo(click.style('❌ Lint issues found (flake8):', fg='red', bold=True))
-                            if combined:
-                                click.echo(combined)
-            else:
-                click.echo("- Skipping linter: flake8 not installed.")
+                returncode = proc.returncode
+            if returncode == 0:
+                return True, output
+            codes = set(_FLAKE8_CODE_RE.findall(combined))
+            if codes and all(c[:2] == 'E3' for c in codes):
+                output.append(click.style('⚠️ Style-only lint issues detected (non-blocking):', fg='yellow'))
+                if combined:
+                    output.append(combined)
+                return True, output
+            output.append(click.style('❌ Lint issues found (flake8):', fg='red', bold=True))
+            if combined:
+                output.append(combined)
+            return False, output
         except Exception as e:
-            success = False
-            click.echo(click.style(f'❌ Error running linter: {e}', fg='red'))
-
-        if success:
-            click.echo(click.style('✅ All validators passed.', fg='green'))
-        else:
-            click.echo(click.style('❌ One or more validators failed.', fg='red'))
+            output.append(click.style(f'❌ Error running linter: {e}', fg='red'))
+            return False, output
 
-        return bool(success)
-
-    def _auto_fix_whitespace(self, work_path: Path):
-        py_files = list(work_path.rglob('*.py'))
+    def _auto_fix_whitespace(self, work_path: Path) -> List[Path]:
+        fixed: List[Path] = []
+        py_files = list(self._iter_py_files(work_path))
         for py_file in py_files:
             try:
                 text = py_file.read_text(encoding='utf-8')
-                lines = text.splitlines()
-                modified = False
-                i = 0
-                while i < len(lines):
-                    line = lines[i]
-                    if (line.startswith('def ') or line.startswith('async def ')) and (len(line) - len(line.lstrip(' ')) == 0):
-                        j = i - 1
-                        blank_count = 0
-                        while j >= 0 and lines[j].strip() == '':
-                            blank_count += 1
-                            j -= 1
-                        if blank_count < 2:
-                            insert_at = i - blank_count
-                            for _ in range(2 - blank_count):
-                                lines.insert(insert_at, '')
-                            modified = True
-                            i += (2 - blank_count)
-                    i += 1
-                if modified:
-                    new = '\n'.join(lines) + '\n'
+                new = _space_top_level_defs(text)
+                if new is not text:
                     py_file.write_text(new, encoding='utf-8')
-            except Exception:
+                    self._text_cache.pop(py_file, None)
+                    fixed.append(py_file)
+            except (OSError, UnicodeError):
                 pass
+        return fixed
 
     def _get_user_approval(self) -> bool:
         click.echo("")
@@ -597,45 +1045,24 @@ class CodeMigrator(BaseMigrator):
 
     def _apply_changes_to_original(self, work_path: Path) -> List[Dict]:
         applied_changes = []
-        deny_dirs = set(['.pytest_cache', '__pycache__', '.venv', 'node_modules', 'dist', 'build'])
-        try:
-            gitignore = self.service_path / '.gitignore'
-            if gitignore.exists():
-                for line in gitignore.read_text().splitlines():
-                    l = line.strip()
-                    if not l or l.startswith('#'):
-                        continue
-                        if l.endswith('/'):
-                            deny_dirs.add(l[:-1])
-        except Exception:
-            pass
-
-        modxignore = self.service_path / '.modxignore'
-        if modxignore.exists():
-            for line in modxignore.read_text().splitlines():
-                l = line.strip()
-                if not l or l.startswith('#'):
-                    continue
-                if l.endswith('/'):
-                    deny_dirs.add(l[:-1])
-
-        allowed_exts = {'.py', '.js', '.ts', '.java', '.go', '.json', '.toml', '.md', '.ini', '.cfg', '.yml', '.yaml', '.xml', '.txt', '.mod'}
+        deny_dirs = self._deny_dirs
 
         service_root_resolved = self.service_path.resolve()
 
+        candidates: List[Tuple[Path, Path, Path]] = []
         for root, dirs, files in os.walk(work_path):
             rel_root = Path(root).relative_to(work_path)
             if any(part in deny_dirs for part in rel_root.parts):
                 continue
 
             for file in files:
+                # Filter on the bare name before building any Path objects
+                if not file.endswith(_COPY_BACK_SUFFIXES) and file.lower() not in _COPY_BACK_NAMES:
+                    continue
                 src = Path(root) / file
                 rel_path = src.relative_to(work_path)
                 if any(part in deny_dirs for part in rel_path.parts):
                     continue
-                if src.suffix not in allowed_exts:
-                    if src.name.lower() not in ('dockerfile', 'makefile'):
-                        continue
 
                 dst = self.service_path / rel_path
                 try:
@@ -646,32 +1073,42 @@ class CodeMigrator(BaseMigrator):
                 except Exception:
                     click.echo(f"Skipping unsafe path: {rel_path}")
                     continue
+                candidates.append((rel_path, src, dst))
 
-                try:
-                    changed = True
-                    if dst.exists():
-                        try:
-                            if src.read_bytes() == dst.read_bytes():
-                                changed = False
-                        except Exception:
-                            changed = True
+        # Comparing is the bulk of the I/O and threads overlap it; moves stay sequential and in walk order
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as ex:
+            unchanged = list(ex.map(_same_content, [c[1] for c in candidates], [c[2] for c in candidates]))
 
-                    if not changed:
-                        continue
-
-                    dst.parent.mkdir(parents=True, exist_ok=True)
-                    backup_path = dst.with_suffix(dst.suffix + '.modx_backup')
-                    if dst.exists():
+        for (rel_path, src, dst), same in zip(candidates, unchanged):
+            if same:
+                continue
+            try:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                backup_path = dst.with_suffix(dst.suffix + '.modx_backup')
+                existed = dst.exists()
+                if dst.is_symlink() or (existed and dst.stat().st_nlink > 1):
+                    # A rename would replace the link itself; copy through it so every name sees the change
+                    if existed:
                         shutil.copy2(dst, backup_path)
                     shutil.copy2(src, dst)
-
-                    applied_changes.append({
-                        'file': str(rel_path),
-                        'action': 'modified' if dst.exists() else 'created',
-                        'backup': str(backup_path) if dst.exists() else None
-                    })
-                except Exception as e:
-                    click.echo(f"Failed to apply changes to {rel_path}: {e}")
+                else:
+                    if existed:
+                        # The original becomes the backup; a rename moves no data
+                        os.replace(dst, backup_path)
+                    try:
+                        _move_file(src, dst)
+                    except Exception:
+                        if existed:
+                            os.replace(backup_path, dst)
+                        raise
+
+                applied_changes.append({
+                    'file': str(rel_path),
+                    'action': 'modified' if existed else 'created',
+                    'backup': str(backup_path) if existed else None
+                })
+            except OSError as e:
+                click.echo(f"Failed to apply changes to {rel_path}: {e}")
 
         return applied_changes
 
@@ -699,34 +1136,18 @@ class CodeMigrator(BaseMigrator):
         click.echo("Run: find . -name '*.modx_backup' -delete  # to clean backups")
 
     def cleanup(self):
+        self._close_attempt_log()
         if self.temp_dir and self.temp_dir.exists():
             shutil.rmtree(self.temp_dir)
 
     def auto_fix_whitespace(self, work_path: Path):
-        py_files = list(work_path.rglob('*.py'))
+        py_files = list(self._iter_py_files(work_path))
         for py_file in py_files:
             try:
                 text = py_file.read_text(encoding='utf-8')
-                lines = text.splitlines()
-                modified = False
-                i = 0
-                while i < len(lines):
-                    line = lines[i]
-                    if (line.startswith('def ') or line.startswith('async def ')) and (len(line) - len(line.lstrip(' ')) == 0):
-                        j = i - 1
-                        blank_count = 0
-                        while j >= 0 and lines[j].strip() == '':
-                            blank_count += 1
-                            j -= 1
-                        if blank_count < 2:
-                            insert_at = i - blank_count
-                            for _ in range(2 - blank_count):
-                                lines.insert(insert_at, '')
-                            modified = True
-                            i += (2 - blank_count)
-                    i += 1
-                if modified:
-                    new = '\n'.join(lines) + '\n'
+                new = _space_top_level_defs(text)
+                if new is not text:
                     py_file.write_text(new, encoding='utf-8')
-            except Exception:
+                    self._text_cache.pop(py_file, None)
+            except (OSError, UnicodeError):
                 pass
\ No newline at end of file
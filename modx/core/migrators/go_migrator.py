@@ -3,7 +3,7 @@
 import re
 import subprocess
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .utils import BaseMigrator, SafeAggressiveTransformer, is_tool_available, run_cmd, has_marker, insert_marker
 
 
@@ -11,7 +11,8 @@ class GoMigrator(BaseMigrator):
     def __init__(self):
         self.transformer = None
 
-    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None):
+    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None, files: Optional[Dict[str, List[Path]]] = None):
+        self._files = files
         if self.transformer is None:
             self.transformer = SafeAggressiveTransformer(work_path, 'go')
         # Enforce DROP_STEP
@@ -37,7 +38,7 @@ class GoMigrator(BaseMigrator):
                     if is_tool_available('go'):
                         run_cmd(['go', 'mod', 'tidy'], str(work_path))
                 # Run gofmt on all .go files
-                go_files = list(work_path.rglob('*.go'))
+                go_files = self.source_files(work_path, '.go')
                 for gf in go_files:
                     try:
                         old_gf = gf.read_text(encoding='utf-8')
@@ -2,12 +2,13 @@
 
 import re
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .utils import BaseMigrator
 
 
 class JavaMigrator(BaseMigrator):
-    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict]):
+    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None, files: Optional[Dict[str, List[Path]]] = None):
+        self._files = files
         if sid == 'java_modernize':
             return self._modernize_java(work_path)
         return []
@@ -115,7 +116,7 @@ class JavaMigrator(BaseMigrator):
                     pass
 
         # Replace javax.* with jakarta.* in Java source files (safe textual replacement)
-        java_files = [p for p in work_path.rglob('*.java')]
+        java_files = self.source_files(work_path, '.java')
         for jf in java_files:
             try:
                 old = jf.read_text(encoding='utf-8')
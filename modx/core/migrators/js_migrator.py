@@ -3,15 +3,34 @@
 import re
 import json
 from pathlib import Path
-from typing import List, Dict
-from .utils import BaseMigrator, SafeAggressiveTransformer, is_tool_available, run_cmd
+from typing import List, Dict, Optional
+from .utils import BaseMigrator, SafeAggressiveTransformer, fast_write, is_tool_available, run_cmd
+
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(data) -> str:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:  # orjson is optional; fall back to the stdlib
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(data) -> str:
+        return json.dumps(data, indent=2)
+
+
+_V0_RE = re.compile(r'^[\^~]0\.')
 
 
 class JSMigrator(BaseMigrator):
     def __init__(self):
         self.transformer = None
 
-    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None):
+    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None, files: Optional[Dict[str, List[Path]]] = None):
+        self._files = files
         if self.transformer is None:
             self.transformer = SafeAggressiveTransformer(work_path, 'javascript')
         # Enforce DROP_STEP
@@ -27,13 +46,17 @@ class JSMigrator(BaseMigrator):
         return []
 
     def _modernize_es6(self, work_path: Path, changes: List[Dict]) -> List[Dict]:
-        js_files = list(work_path.rglob('*.js')) + list(work_path.rglob('*.ts'))
+        js_files = self.source_files(work_path, '.js', '.ts')
         for jf in js_files:
             try:
-                old = jf.read_text(encoding='utf-8')
+                raw = jf.read_bytes()
+                # Cheap byte-level prefilter: skip files none of the passes can touch
+                if b'var ' not in raw and b'function ' not in raw and b'" +' not in raw and b'"+' not in raw:
+                    continue
+                old = raw.decode('utf-8')
                 new = self.transformer.apply_safe_transformation(jf, old, self._transform_js_content)
                 if new:
-                    jf.write_text(new, encoding='utf-8')
+                    fast_write(jf, new)
                     self.record_change(jf, 'es6_syntax', old, new, changes, work_path)
             except Exception:
                 pass
@@ -58,12 +81,10 @@ class JSMigrator(BaseMigrator):
                 for v in vars:
                     if re.search(rf'\b{v}\s*=', line):
                         vars[v] = 'let'
-        for i, line in enumerate(lines):
-            for var_name, kind in vars.items():
-                if f'var {var_name}' in line:
-                    lines[i] = line.replace(f'var {var_name}', f'{kind} {var_name}')
-                    break
-        content = '\n'.join(lines)
+        if vars:
+            # Single linear scan over the whole content instead of a per-line/per-var loop
+            pattern = re.compile(r'\bvar\s+(' + '|'.join(re.escape(v) for v in vars) + r')\b')
+            content = pattern.sub(lambda m: f'{vars[m.group(1)]} {m.group(1)}', content)
         # String concat to template literals (only if contains quoted string and identifier)
         def replace_concat(match):
             expr = match.group(0)
@@ -82,21 +103,21 @@ class JSMigrator(BaseMigrator):
         package_json = work_path / 'package.json'
         if package_json.exists():
             try:
-                data = json.loads(package_json.read_text())
+                data = _loads(package_json.read_bytes())
                 modified = False
                 for dep_type in ['dependencies', 'devDependencies']:
                     if dep_type in data:
-                        for pkg, ver in data[dep_type].items():
-                            if isinstance(ver, str) and (ver.startswith('^0.') or ver.startswith('~0.')):
+                        for pkg, ver in list(data[dep_type].items()):
+                            if isinstance(ver, str) and _V0_RE.match(ver):
                                 data[dep_type][pkg] = '^1.0.0'
                                 modified = True
                 if modified:
-                    new_content = json.dumps(data, indent=2) + '\n'
+                    new_content = _dumps(data) + '\n'
                     package_json.write_text(new_content, encoding='utf-8')
                     self.record_change(package_json, 'update_js_deps', None, new_content, changes, work_path)
                     # Run npm install if available
                     if is_tool_available('npm'):
-                        run_cmd(['npm', 'install'], str(work_path))
+                        run_cmd(['npm', 'install'], str(work_path), discard_output=True)
             except Exception:
                 pass
         return changes
\ No newline at end of file
@@ -1,17 +1,23 @@
 """Python-specific migrator."""
 
-import ast
+import io
 import re
+import tokenize
 from pathlib import Path
-from typing import List, Dict
-from .utils import BaseMigrator, SafeAggressiveTransformer
+from typing import List, Dict, Optional
+from .utils import BaseMigrator, SafeAggressiveTransformer, fast_write
+
+
+# A py2 print statement on its own line; the argument must not start with "("
+_PRINT_RE = re.compile(r'(?m)^(?P<indent>[ \t]*)print[ \t]+(?P<arg>[^\s(][^\r\n]*?)[ \t]*(?=\r?$)')
 
 
 class PythonMigrator(BaseMigrator):
     def __init__(self):
         self.transformer = None
 
-    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None):
+    def handle_step(self, sid: str, work_path: Path, targets: List[str], changes: List[Dict], service_path: Path = None, files: Optional[Dict[str, List[Path]]] = None):
+        self._files = files
         if self.transformer is None:
             self.transformer = SafeAggressiveTransformer(work_path, 'python')
         # Enforce DROP_STEP
@@ -30,80 +36,151 @@ class PythonMigrator(BaseMigrator):
         return []
 
     def _fix_python_print_statements(self, work_path: Path, changes: List[Dict]) -> List[Dict]:
-        py_files = list(work_path.rglob("*.py"))
+        py_files = self.source_files(work_path, '.py')
         for py_file in py_files:
             try:
-                old = py_file.read_text(encoding='utf-8')
-                # Simple regex to convert print statements to functions
-                new = re.sub(r'\bprint\s+([^(\n]+)', r'print(\1)', old)
+                raw = py_file.read_bytes()
+                if b'print' not in raw:
+                    continue
+                old = raw.decode('utf-8')
+                # Single compiled pass over the whole file
+                new = _PRINT_RE.sub(r'\g<indent>print(\g<arg>)', old)
                 new = self.transformer.apply_safe_transformation(py_file, old, lambda _: new)
                 if new:
-                    py_file.write_text(new, encoding='utf-8')
+                    fast_write(py_file, new)
                     self.record_change(py_file, 'python_print_fix', old, new, changes, work_path)
             except Exception:
                 pass
         return changes
 
     def _add_basic_type_hints(self, work_path: Path, changes: List[Dict]) -> List[Dict]:
-        py_files = list(work_path.rglob("*.py"))
+        py_files = self.source_files(work_path, '.py')
         for py_file in py_files:
             try:
-                old = py_file.read_text(encoding='utf-8')
-                tree = ast.parse(old)
-                new_tree = self._add_hints_to_tree(tree)
-                new_content = ast.unparse(new_tree) if hasattr(ast, 'unparse') else old  # Python 3.9+
+                raw = py_file.read_bytes()
+                if b'def' not in raw:
+                    continue
+                old = raw.decode('utf-8')
+                new_content = self._add_hints_to_source(old)
                 # Add import Any if needed
-                if 'Any' in new_content and 'from typing import' not in new_content:
-                    lines = new_content.splitlines()
+                if new_content != old and 'from typing import' not in new_content:
                     insert_pos = 0
-                    if lines and lines[0].startswith('#!'):
-                        insert_pos = 1
-                    lines.insert(insert_pos, 'from typing import Any')
-                    new_content = '\n'.join(lines) + '\n'
+                    if new_content.startswith('#!'):
+                        insert_pos = new_content.find('\n') + 1 or len(new_content)
+                    new_content = new_content[:insert_pos] + 'from typing import Any\n' + new_content[insert_pos:]
                 new = self.transformer.apply_safe_transformation(py_file, old, lambda _: new_content)
                 if new:
-                    py_file.write_text(new, encoding='utf-8')
+                    fast_write(py_file, new)
                     self.record_change(py_file, 'type_hints', old, new, changes, work_path)
             except Exception:
                 pass
         return changes
 
-    def _add_hints_to_tree(self, tree: ast.AST) -> ast.AST:
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and not node.returns:
-                has_explicit_return = any(isinstance(n, ast.Return) and n.value is not None for n in ast.walk(node))
-                if not has_explicit_return:
-                    node.returns = ast.Name(id='Any', ctx=ast.Load())
-        return tree
+    def _add_hints_to_source(self, source: str) -> str:
+        """Splice ``-> Any`` into unannotated ``def`` headers whose bodies never return a value.
+
+        Works in a single tokenizer pass and leaves every other byte of the source
+        (comments, formatting) untouched.
+        """
+        scopes = []  # open function bodies, innermost last
+        header = None  # function whose signature is being read
+        awaiting_block = None  # function whose header ended in ':' NEWLINE
+        inserts = []
+        depth = 0
+        prev = None
+
+        def close(scope):
+            if not scope['skip'] and not scope['annotated'] and not scope['returns']:
+                inserts.append(scope['close'])
+
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            ttype, tstr = tok.type, tok.string
+            if ttype == tokenize.INDENT:
+                depth += 1
+                if awaiting_block is not None:
+                    awaiting_block['level'] = depth
+                    scopes.append(awaiting_block)
+                    awaiting_block = None
+            elif ttype == tokenize.DEDENT:
+                depth -= 1
+                while scopes and scopes[-1]['level'] is not None and scopes[-1]['level'] > depth:
+                    close(scopes.pop())
+            elif header is not None:
+                if ttype == tokenize.OP:
+                    if tstr in '([{':
+                        header['parens'] += 1
+                    elif tstr in ')]}':
+                        header['parens'] -= 1
+                        if header['parens'] == 0 and tstr == ')':
+                            header['close'] = tok.end
+                    elif tstr == '->' and header['parens'] == 0:
+                        header['annotated'] = True
+                    elif tstr == ':' and header['parens'] == 0:
+                        awaiting_block, header = header, None
+            elif awaiting_block is not None and ttype not in (tokenize.NL, tokenize.COMMENT):
+                if ttype != tokenize.NEWLINE:
+                    # One-line body (``def f(): pass``) ends at the next NEWLINE
+                    scopes.append(awaiting_block)
+                    awaiting_block = None
+            if ttype == tokenize.NAME and tstr == 'def' and header is None:
+                header = {
+                    'parens': 0, 'close': None, 'annotated': False, 'returns': False, 'level': None,
+                    'skip': prev is not None and prev.string == 'async',
+                }
+            elif prev is not None and prev.type == tokenize.NAME and prev.string == 'return' and scopes:
+                if ttype not in (tokenize.NEWLINE, tokenize.COMMENT, tokenize.ENDMARKER) and tstr != ';':
+                    for scope in scopes:
+                        scope['returns'] = True
+            if ttype == tokenize.NEWLINE:
+                while scopes and scopes[-1]['level'] is None:
+                    close(scopes.pop())
+            if ttype not in (tokenize.NL, tokenize.COMMENT):
+                prev = tok
+        while scopes:
+            close(scopes.pop())
+
+        if not inserts:
+            return source
+        offsets = [0]
+        for line in io.StringIO(source).readlines():
+            offsets.append(offsets[-1] + len(line))
+        parts = []
+        last = 0
+        for row, col in sorted(inserts):
+            pos = offsets[row - 1] + col
+            parts.append(source[last:pos])
+            parts.append(' -> Any')
+            last = pos
+        parts.append(source[last:])
+        return ''.join(parts)
 
     def _fix_whitespace(self, work_path: Path, changes: List[Dict]) -> List[Dict]:
-        py_files = list(work_path.rglob("*.py"))
+        py_files = self.source_files(work_path, '.py')
         for py_file in py_files:
             try:
-                old = py_file.read_text(encoding='utf-8')
-                lines = old.splitlines()
-                new_lines = []
-                i = 0
-                while i < len(lines):
-                    line = lines[i]
-                    stripped = line.strip()
-                    if stripped and (stripped.startswith('def ') or stripped.startswith('class ') or stripped.startswith('async def ')):
-                        # Ensure two blank lines before
-                        blank_count = 0
-                        j = len(new_lines) - 1
-                        while j >= 0 and new_lines[j].strip() == '':
-                            blank_count += 1
-                            j -= 1
-                        if blank_count < 2:
-                            while blank_count < 2:
-                                new_lines.append('')
-                                blank_count += 1
-                    new_lines.append(line)
-                    i += 1
+                raw = py_file.read_bytes()
+                if b'def ' not in raw and b'class ' not in raw:
+                    continue
+                old = raw.decode('utf-8')
+                old_lines = old.splitlines()
+                new_lines = list(self._iter_spaced_lines(old_lines))
                 new_content = '\n'.join(new_lines) + '\n'
                 if new_content != old:
-                    py_file.write_text(new_content, encoding='utf-8')
-                    self.record_change(py_file, 'whitespace_fix', old, new_content, changes, work_path)
+                    fast_write(py_file, new_content)
+                    self.record_change(py_file, 'whitespace_fix', old, new_content, changes, work_path,
+                                       old_lines=old_lines, new_lines=new_lines)
             except Exception:
                 pass
-        return changes
\ No newline at end of file
+        return changes
+
+    def _iter_spaced_lines(self, lines: List[str]):
+        """Yield lines, ensuring two blank lines before each def/class header."""
+        blank_count = 0
+        for line in lines:
+            stripped = line.strip()
+            if stripped and (stripped.startswith('def ') or stripped.startswith('class ') or stripped.startswith('async def ')):
+                while blank_count < 2:
+                    yield ''
+                    blank_count += 1
+            blank_count = 0 if stripped else blank_count + 1
+            yield line
@@ -1,6 +1,9 @@
 """Shared utilities for migrators."""
 
-import difflib
+import functools
+import os
+import re
+from itertools import chain
 from pathlib import Path
 from typing import Dict, List, Optional, Literal
 import ast
@@ -8,47 +11,71 @@ import subprocess
 import logging
 import shutil
 
+try:
+    from cdifflib import CSequenceMatcher as SequenceMatcher
+except ImportError:  # cdifflib is optional; fall back to the pure-Python matcher
+    from difflib import SequenceMatcher
 
-class BaseMigrator:
-    def record_change(self, file_path: Path, change_type: str, old_content: Optional[str], new_content: Optional[str], changes: List[Dict], work_path: Path):
-        try:
-            lines_changed = 0
-            if old_content is not None and new_content is not None:
-                diff_lines = list(difflib.unified_diff(
-                    (old_content or '').splitlines(keepends=False),
-                    (new_content or '').splitlines(keepends=False),
-                    lineterm=''
-                ))
-                lines_changed = sum(1 for l in diff_lines if (l.startswith('+') or l.startswith('-')) and not l.startswith('+++') and not l.startswith('---') and not l.startswith('@@'))
-            changes.append({
-                'file': str(file_path.relative_to(work_path)),
-                'type': change_type,
-                'lines_changed': lines_changed
-            })
-        except Exception:
-            changes.append({'file': str(file_path), 'type': change_type})
+
+_FATAL_RE = re.compile(r'\b(F\d{3}|SyntaxError|Traceback|NameError|undefined name)\b')
+_MARKER_LANG = {'python': 'py', 'javascript': 'js', 'typescript': 'ts', 'go': 'go'}
 
 
 def has_marker(text: str) -> bool:
-    return 'MODX_DETERMINISTIC_FALLBACK' in text
+    # insert_marker always places the marker within the first two lines
+    return 'MODX_DETERMINISTIC_FALLBACK' in text[:256]
 
 
 def insert_marker(text: str, lang: Literal['py', 'js', 'ts', 'go']) -> str:
     if has_marker(text):
         return text
     if lang == 'py':
-        lines = text.splitlines()
-        if lines and lines[0].startswith('#!'):
-            lines.insert(1, '# MODX_DETERMINISTIC_FALLBACK: aggressive modernization applied')
-        else:
-            lines.insert(0, '# MODX_DETERMINISTIC_FALLBACK: aggressive modernization applied')
-        return '\n'.join(lines) + '\n'
+        marker = '# MODX_DETERMINISTIC_FALLBACK: aggressive modernization applied\n'
+        if text.startswith('#!'):
+            nl = text.find('\n')
+            if nl == -1:
+                return text + '\n' + marker
+            return text[:nl + 1] + marker + text[nl + 1:]
+        return marker + text
     elif lang in ('js', 'ts', 'go'):
         marker = '// MODX_DETERMINISTIC_FALLBACK: aggressive modernization applied\n'
         return marker + text
     return text
 
 
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+
+def unified_diff(a: List[str], b: List[str], fromfile: str = '', tofile: str = '', n: int = 3):
+    """Same output as ``difflib.unified_diff(..., lineterm='')``, using the fastest available SequenceMatcher."""
+    started = False
+    for group in SequenceMatcher(None, a, b).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}'
+            yield f'+++ {tofile}'
+        first, last = group[0], group[-1]
+        yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
+
+
 def safe_read(path: Path) -> Optional[str]:
     try:
         return path.read_text(encoding='utf-8')
@@ -63,9 +90,28 @@ def safe_write(path: Path, text: str):
         pass
 
 
-def run_cmd(args: List[str], cwd: str, allow_missing_tool: bool = True) -> tuple[int, str, str]:
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+
+
+def fast_write(path: Path, text: str):
+    """Write ``text`` as UTF-8 through a raw fd: no buffered text layer and no newline translation."""
+    data = memoryview(text.encode('utf-8'))
+    fd = os.open(path, _WRITE_FLAGS, 0o644)
     try:
-        proc = subprocess.run(args, cwd=cwd, capture_output=True, text=True)
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def run_cmd(args: List[str], cwd: str, allow_missing_tool: bool = True, discard_output: bool = False) -> tuple[int, str, str]:
+    # Skipping the fd-closing sweep is safe here: the children are short-lived tools
+    close_fds = os.name != 'posix'
+    try:
+        if discard_output:
+            proc = subprocess.run(args, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=close_fds)
+            return proc.returncode, '', ''
+        proc = subprocess.run(args, cwd=cwd, capture_output=True, text=True, close_fds=close_fds)
         return proc.returncode, proc.stdout, proc.stderr
     except FileNotFoundError:
         if allow_missing_tool:
@@ -73,8 +119,14 @@ def run_cmd(args: List[str], cwd: str, allow_missing_tool: bool = True) -> tuple
         raise
 
 
+@functools.lru_cache(maxsize=None)
+def which(name: str) -> Optional[str]:
+    return shutil.which(name)
+
+
+@functools.lru_cache(maxsize=None)
 def is_tool_available(name: str) -> bool:
-    return shutil.which(name) is not None
+    return which(name) is not None
 
 
 def drop_step_if_missing_files(step, service_root: Path) -> bool:
@@ -93,16 +145,29 @@ def drop_step_if_missing_files(step, service_root: Path) -> bool:
 
 
 class BaseMigrator:
-    def record_change(self, file_path: Path, change_type: str, old_content: Optional[str], new_content: Optional[str], changes: List[Dict], work_path: Path):
+    _files: Optional[Dict[str, List[Path]]] = None
+
+    def source_files(self, work_path: Path, *exts: str) -> List[Path]:
+        """Files under ``work_path`` with the given suffixes, from the caller's pre-walked tree when available."""
+        if self._files is not None:
+            found = chain.from_iterable(self._files.get(ext, ()) for ext in exts)
+        else:
+            found = chain.from_iterable(work_path.rglob(f'*{ext}') for ext in exts)
+        return list(found)
+
+    def record_change(self, file_path: Path, change_type: str, old_content: Optional[str], new_content: Optional[str], changes: List[Dict], work_path: Path,
+                      old_lines: Optional[List[str]] = None, new_lines: Optional[List[str]] = None):
+        """Append a change record; callers that already split the contents can pass ``old_lines``/``new_lines``."""
         try:
             lines_changed = 0
-            if old_content is not None and new_content is not None:
-                diff_lines = list(difflib.unified_diff(
-                    (old_content or '').splitlines(keepends=False),
-                    (new_content or '').splitlines(keepends=False),
-                    lineterm=''
-                ))
-                lines_changed = sum(1 for l in diff_lines if (l.startswith('+') or l.startswith('-')) and not l.startswith('+++') and not l.startswith('---') and not l.startswith('@@'))
+            if old_content is not None and new_content is not None and old_content != new_content:
+                # Count straight from the opcodes; no need to render a unified diff
+                if old_lines is None:
+                    old_lines = old_content.splitlines()
+                if new_lines is None:
+                    new_lines = new_content.splitlines()
+                sm = SequenceMatcher(None, old_lines, new_lines)
+                lines_changed = sum((i2 - i1) + (j2 - j1) for tag, i1, i2, j1, j2 in sm.get_opcodes() if tag != 'equal')
             changes.append({
                 'file': str(file_path.relative_to(work_path)),
                 'type': change_type,
@@ -140,7 +205,7 @@ class SafeAggressiveTransformer:
 
     def apply_safe_transformation(self, file_path: Path, original_content: str, transform_func) -> Optional[str]:
         """Apply transformation with safety checks."""
-        if 'MODX_DETERMINISTIC_FALLBACK' in original_content:
+        if has_marker(original_content):
             return None  # Skip already processed
 
         new_content = transform_func(original_content)
@@ -152,7 +217,7 @@ class SafeAggressiveTransformer:
             return None
 
         # Add marker
-        lang_code = {'python': 'py', 'javascript': 'js', 'typescript': 'ts', 'go': 'go'}.get(self.language, 'js')
+        lang_code = _MARKER_LANG.get(self.language, 'js')
         new_content = insert_marker(new_content, lang_code)
 
         return new_content
@@ -162,49 +227,39 @@ class SafeAggressiveTransformer:
         try:
             if self.language == 'python':
                 # Run flake8 + mypy
-                import subprocess
-                import shutil
-                flake8 = shutil.which('flake8')
+                flake8 = which('flake8')
                 if flake8:
                     proc = subprocess.run([flake8, str(self.work_path)], capture_output=True, text=True)
                     if proc.returncode != 0:
-                        # Parse codes
-                        import re
-                        codes = re.findall(r"\b([A-Z]\d{3})\b", proc.stdout + proc.stderr)
-                        serious = any(c.startswith('F') for c in codes) or 'SyntaxError' in (proc.stdout + proc.stderr) or 'Traceback' in (proc.stdout + proc.stderr) or 'NameError' in (proc.stdout + proc.stderr) or 'undefined name' in (proc.stdout + proc.stderr)
-                        if serious:
-                            return False
-                        # E3xx are warnings
-                mypy = shutil.which('mypy')
+                        # Stop at the first F-code or fatal keyword; E3xx are warnings
+                        for line in chain(proc.stdout.splitlines(), proc.stderr.splitlines()):
+                            if _FATAL_RE.search(line):
+                                return False
+                mypy = which('mypy')
                 if mypy:
                     proc = subprocess.run([mypy, str(self.work_path)], capture_output=True, text=True)
                     if proc.returncode != 0:
                         # Treat as blocking if fatal errors
-                        if 'error:' in proc.stdout.lower() or 'error:' in proc.stderr.lower():
-                            return False
+                        for line in chain(proc.stdout.splitlines(), proc.stderr.splitlines()):
+                            if 'error:' in line.lower():
+                                return False
             elif self.language in ('javascript', 'typescript'):
                 # Run eslint
-                import subprocess
-                import shutil
-                eslint = shutil.which('eslint')
+                eslint = which('eslint')
                 if eslint:
                     proc = subprocess.run([eslint, str(self.work_path), '--ext', '.js,.ts', '--max-warnings=0'], capture_output=True, text=True)
                     if proc.returncode != 0:
                         return False
             elif self.language == 'java':
                 # Run mvn validate
-                import subprocess
-                import shutil
-                mvn = shutil.which('mvn')
+                mvn = which('mvn')
                 if mvn:
                     proc = subprocess.run([mvn, 'validate'], cwd=str(self.work_path), capture_output=True, text=True)
                     if proc.returncode != 0:
                         return False
             elif self.language == 'go':
                 # Run go vet
-                import subprocess
-                import shutil
-                go = shutil.which('go')
+                go = which('go')
                 if go:
                     proc = subprocess.run([go, 'vet', './...'], cwd=str(self.work_path), capture_output=True, text=True)
                     if proc.returncode != 0:
@@ -1,165 +1,386 @@
 """Planner module moved into core package."""
 import os
+import json
+import functools
+import hashlib
+import sqlite3
+import sys
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Mapping
+from contextlib import closing
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
-from .analyzer import CodebaseAnalyzer
+from types import MappingProxyType
+from typing import ClassVar, Dict, List, Optional
+from .analyzer import CodebaseAnalyzer, list_files, select_files
 from ..ai import AIModernizer
 
 
+# Constant parts of the deterministic steps; builders only add the per-plan fields
+_PY_PRINT_TEMPLATE = MappingProxyType({
+    "id": "python_print_function",
+    "title": "Update Python 2 print statements",
+    "description": "Replace 'print' statements with 'print()' function calls",
+    "risk": "low"
+})
+_PY_DEPS_TEMPLATE = MappingProxyType({
+    "id": "update_dependencies",
+    "title": "Update Python dependencies",
+    "description": "Update outdated Python packages to latest compatible versions",
+    "estimated_loc": 10,
+    "risk": "medium"
+})
+_PY_TYPE_HINTS_TEMPLATE = MappingProxyType({
+    "id": "add_type_hints",
+    "title": "Add type hints to functions",
+    "description": "Add type annotations to improve code maintainability",
+    "estimated_loc": 50,
+    "risk": "low"
+})
+_JS_ES6_TEMPLATE = MappingProxyType({
+    "id": "es6_syntax",
+    "title": "Modernize to ES6+ syntax",
+    "description": "Convert var to const/let, arrow functions, template literals",
+    "estimated_loc": 100,
+    "risk": "low"
+})
+_JS_DEPS_TEMPLATE = MappingProxyType({
+    "id": "update_js_deps",
+    "title": "Update JavaScript dependencies",
+    "description": "Update npm packages to latest versions",
+    "estimated_loc": 5,
+    "risk": "medium"
+})
+_JAVA_MODERNIZE_TEMPLATE = MappingProxyType({
+    "id": "java_modernize",
+    "title": "Modernize Java code",
+    "description": "Use var for local variables, switch expressions, text blocks",
+    "estimated_loc": 150,
+    "risk": "medium"
+})
+_GO_MODULES_TEMPLATE = MappingProxyType({
+    "id": "go_modules",
+    "title": "Update Go dependencies",
+    "description": "Update go.mod dependencies to latest versions",
+    "estimated_loc": 10,
+    "risk": "medium"
+})
+
+
+_RISK_THRESHOLDS = ((10, "high"), (5, "medium"))
+_CACHE_ROOT = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "modx"
+_PLAN_CACHE_DIR = _CACHE_ROOT / "plans"
+# One incremental-analysis database per service, named by a hash of its resolved path
+_ANALYSIS_CACHE_DIR = _CACHE_ROOT / "analysis"
+# Bump when the Plan layout or the step builders change, so older cached plans are ignored
+_PLAN_CACHE_VERSION = 1
+_PLAN_CACHE_MAX = 64
+_AI_PREFIX = sys.intern('AI-suggested-file')
+
+
+def _is_actionable(step, _T=dict, _P=_AI_PREFIX) -> bool:
+    """An AI step is actionable unless its patch only targets placeholder files."""
+    if type(step) is not _T:
+        return True
+    patch = step.get('patch')
+    if type(patch) is not _T or not patch:
+        return True
+    for k in patch:
+        if k and not (type(k) is str and k.startswith(_P)):
+            return True
+    return False
+
+
+def _py_print_step(py2_issues: List[Dict]) -> Dict:
+    return {
+        **_PY_PRINT_TEMPLATE,
+        "files_affected": [i["file"] for i in py2_issues],
+        "estimated_loc": len(py2_issues) * 5,
+    }
+
+
+def _py_deps_step() -> Dict:
+    return {**_PY_DEPS_TEMPLATE, "files_affected": ["requirements.txt", "pyproject.toml"]}
+
+
+def _py_type_hints_step(findings: Dict) -> Dict:
+    return {**_PY_TYPE_HINTS_TEMPLATE, "files_affected": list(islice(findings["languages"].get("python", ()), 5))}
+
+
+def _js_es6_step(findings: Dict) -> Dict:
+    return {**_JS_ES6_TEMPLATE, "files_affected": list(islice(findings["languages"].get("javascript", ()), 5))}
+
+
+def _js_deps_step() -> Dict:
+    return {**_JS_DEPS_TEMPLATE, "files_affected": ["package.json"]}
+
+
+def _java_modernize_step(findings: Dict) -> Dict:
+    return {**_JAVA_MODERNIZE_TEMPLATE, "files_affected": list(islice(findings["languages"].get("java", ()), 5))}
+
+
+def _go_modules_step() -> Dict:
+    return {**_GO_MODULES_TEMPLATE, "files_affected": ["go.mod", "go.sum"]}
+
+
+@dataclass(frozen=True, eq=False)
+class Plan(Mapping):
+    """Result of ``ModernizationPlanner.plan()``.
+
+    Slotted and immutable, but still readable like the plain dict it replaces
+    (``plan['steps']``, ``plan.get('ai_fallback')``).
+    """
+    __slots__ = ("service", "current_state", "steps", "estimated_loc", "risk_level", "ai_fallback")
+
+    service: str
+    current_state: Dict
+    steps: List[Dict]
+    estimated_loc: int
+    risk_level: str
+    ai_fallback: bool
+
+    def __getitem__(self, key: str):
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+
 class ModernizationPlanner:
+    # Method names rather than bound methods; javascript/typescript share a handler
+    _LANG_HANDLERS: ClassVar[Dict[str, str]] = {
+        "python": "_python_steps",
+        "javascript": "_javascript_steps",
+        "typescript": "_javascript_steps",
+        "java": "_java_steps",
+        "golang": "_golang_steps",
+    }
+
     def __init__(self, service_path: str, use_ai: bool = True) -> None:
         self.service_path = Path(service_path)
         self.use_ai = use_ai
         self.analyzer = CodebaseAnalyzer(service_path, use_ai)
-        self.ai_modernizer = AIModernizer() if use_ai else None
+        service_key = hashlib.blake2b(str(self.service_path.resolve()).encode("utf-8", "surrogateescape"), digest_size=16).hexdigest()
+        self._cache_path = _ANALYSIS_CACHE_DIR / f"{service_key}.sqlite"
 
-    def plan(self) -> Dict:
-        """Generate a modernization plan for the service."""
-        findings = self.analyzer.analyze()
-        steps = []
-        if self.use_ai:
-            if not self.ai_modernizer or not self.ai_modernizer.is_available():
+    @functools.cached_property
+    def ai_modernizer(self) -> Optional[AIModernizer]:
+        # Built on first use, so deterministic planning never constructs a client
+        return AIModernizer() if self.use_ai else None
+
+    def plan(self) -> "Plan":
+        """Generate a modernization plan for the service.
+
+        Plans are cached on disk by a hash of the tree, so re-planning an
+        unchanged tree skips both the analysis and the AI calls. The AI backend
+        is still required to be up when ``use_ai`` is set.
+        """
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            # Probe the AI backend (network) while the tree is walked (filesystem)
+            ai_ready = ex.submit(self.ai_modernizer.is_available) if self.use_ai and self.ai_modernizer else None
+            stats: Dict[str, os.stat_result] = {}
+            try:
+                files = list_files(self.service_path, stats)
+                tree_hash = self._tree_hash(stats)
+            except OSError:
+                files = tree_hash = None
+
+            if self.use_ai and (ai_ready is None or not ai_ready.result()):
                 raise RuntimeError("AI backend unavailable - service down")
+            if tree_hash is not None:
+                cached = self._load_cached_plan(tree_hash)
+                if cached is not None:
+                    return cached
+
             try:
-                findings = self.ai_modernizer.enhance_analysis(findings)
-            except Exception:
-                findings['ai_enhanced'] = False
+                if files is None:
+                    raise OSError("service tree could not be listed")
+                findings = self._analyze_incremental(files, stats)
+            except (sqlite3.Error, OSError, ValueError):
+                findings = self.analyzer.analyze()
+
+            steps = []
+            if self.use_ai:
+                enhanced = ex.submit(self.ai_modernizer.enhance_analysis, findings)
+                # Estimates only read languages/issues, so they overlap with the AI call
+                estimated_loc = self._estimate_loc_changes(findings)
+                risk_level = self._assess_risk(findings)
+                try:
+                    findings = enhanced.result()
+                except Exception:
+                    findings['ai_enhanced'] = False
+            else:
+                estimated_loc = self._estimate_loc_changes(findings)
+                risk_level = self._assess_risk(findings)
 
+        if self.use_ai:
             ai_steps = self.ai_modernizer.generate_ai_modernization_steps(findings)
-            actionable_ai_steps = []
-            for s in (ai_steps or []):
-                patch = s.get('patch') if isinstance(s, dict) else None
-                if patch and isinstance(patch, dict):
-                    has_real_target = any(k and not str(k).startswith('AI-suggested-file') for k in patch.keys())
-                    if has_real_target:
-                        actionable_ai_steps.append(s)
-                else:
-                    actionable_ai_steps.append(s)
+            actionable_ai_steps = [s for s in (ai_steps or ()) if _is_actionable(s)]
 
             if actionable_ai_steps:
                 steps = actionable_ai_steps
                 ai_fallback = False
             else:
-                steps = self._generate_steps(findings)
+                steps = self._generate_steps(findings, ai_steps=ai_steps or [])
                 ai_fallback = True
         else:
             steps = self._generate_steps(findings)
             ai_fallback = False
 
-        plan = {
-            "service": str(self.service_path),
-            "current_state": findings,
-            "steps": steps,
-            "estimated_loc": self._estimate_loc_changes(),
-            "risk_level": self._assess_risk(),
-            "ai_fallback": bool(ai_fallback)
-        }
+        plan = Plan(
+            service=str(self.service_path),
+            current_state=findings,
+            steps=steps,
+            estimated_loc=estimated_loc,
+            risk_level=risk_level,
+            ai_fallback=bool(ai_fallback)
+        )
 
+        if tree_hash is not None:
+            self._save_cached_plan(tree_hash, plan)
         return plan
 
-    def _generate_steps(self, findings: Dict) -> List[Dict]:
+    def _tree_hash(self, stats: Dict[str, os.stat_result]) -> str:
+        """Digest of the path, size and mtime of every file in ``stats``, plus the planning mode.
+
+        Entries are sorted so the digest does not depend on walk order. Contents
+        are not read; any edit changes the size or mtime of the file it touches.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{_PLAN_CACHE_VERSION}\0{self.service_path.resolve()}\0{self.use_ai}\n".encode("utf-8", "surrogateescape"))
+        for rel in sorted(stats):
+            st = stats[rel]
+            h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
+    def _load_cached_plan(self, tree_hash: str) -> Optional["Plan"]:
+        path = _PLAN_CACHE_DIR / f"{tree_hash}.json"
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            state = data["current_state"]
+            if "language_set" in state:
+                state["language_set"] = frozenset(state["language_set"])
+            plan = Plan(**data)
+            # Refresh the mtime so eviction drops the least recently used plans first
+            os.utime(path)
+            return plan
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _save_cached_plan(self, tree_hash: str, plan: "Plan") -> None:
+        try:
+            # language_set is the only non-JSON value; it is stored as a sorted list
+            text = json.dumps(plan.to_dict(), default=sorted)
+            _PLAN_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            target = _PLAN_CACHE_DIR / f"{tree_hash}.json"
+            tmp = target.with_suffix(".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, target)
+            cached = sorted(_PLAN_CACHE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime_ns)
+            for old in cached[:-_PLAN_CACHE_MAX]:
+                old.unlink()
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def _generate_steps(self, findings: Dict, ai_steps: Optional[List[Dict]] = None) -> List[Dict]:
         steps = []
-        if "python" in findings["languages"]:
-            steps.extend(self._python_steps(findings))
-        if "javascript" in findings["languages"] or "typescript" in findings["languages"]:
-            steps.extend(self._javascript_steps(findings))
-        if "java" in findings["languages"]:
-            steps.extend(self._java_steps(findings))
-        if "golang" in findings["languages"]:
-            steps.extend(self._golang_steps(findings))
-        if self.use_ai and self.ai_modernizer:
+        langs = findings.get("language_set") or frozenset(findings["languages"])
+        active = langs & self._LANG_HANDLERS.keys()
+        handlers = []
+        # Walk the table (not the set) so steps keep a stable language order
+        for lang, handler in self._LANG_HANDLERS.items():
+            if lang in active and handler not in handlers:
+                handlers.append(handler)
+        for name in handlers:
+            steps.extend(getattr(self, name)(findings))
+        if ai_steps is None and self.use_ai and self.ai_modernizer is not None:
             ai_steps = self.ai_modernizer.generate_ai_modernization_steps(findings)
+        if ai_steps:
             steps.extend(ai_steps)
         return steps
 
     def _python_steps(self, findings: Dict) -> List[Dict]:
-        steps = []
-        py2_issues = [i for i in findings["outdated_issues"] if i["type"] == "python2_print"]
-        if py2_issues:
-            steps.append({
-                "id": "python_print_function",
-                "title": "Update Python 2 print statements",
-                "description": "Replace 'print' statements with 'print()' function calls",
-                "files_affected": [i["file"] for i in py2_issues],
-                "estimated_loc": len(py2_issues) * 5,
-                "risk": "low"
-            })
-
-        if "python" in findings["frameworks"]:
-            steps.append({
-                "id": "update_dependencies",
-                "title": "Update Python dependencies",
-                "description": "Update outdated Python packages to latest compatible versions",
-                "files_affected": ["requirements.txt", "pyproject.toml"],
-                "estimated_loc": 10,
-                "risk": "medium"
-            })
-
-        steps.append({
-            "id": "add_type_hints",
-            "title": "Add type hints to functions",
-            "description": "Add type annotations to improve code maintainability",
-            "files_affected": findings["languages"].get("python", [])[:5],
-            "estimated_loc": 50,
-            "risk": "low"
-        })
-
-        return steps
+        py2_issues = findings.get("outdated_issues_by_type", {}).get("python2_print", ())
+        return [s for s in (
+            _py_print_step(py2_issues) if py2_issues else None,
+            _py_deps_step() if "python" in findings["frameworks"] else None,
+            _py_type_hints_step(findings),
+        ) if s is not None]
 
     def _javascript_steps(self, findings: Dict) -> List[Dict]:
-        steps = []
-        steps.append({
-            "id": "es6_syntax",
-            "title": "Modernize to ES6+ syntax",
-            "description": "Convert var to const/let, arrow functions, template literals",
-            "files_affected": findings["languages"].get("javascript", [])[:5],
-            "estimated_loc": 100,
-            "risk": "low"
-        })
-        if "javascript" in findings["frameworks"]:
-            steps.append({
-                "id": "update_js_deps",
-                "title": "Update JavaScript dependencies",
-                "description": "Update npm packages to latest versions",
-                "files_affected": ["package.json"],
-                "estimated_loc": 5,
-                "risk": "medium"
-            })
-        return steps
+        return [s for s in (
+            _js_es6_step(findings),
+            _js_deps_step() if "javascript" in findings["frameworks"] else None,
+        ) if s is not None]
 
     def _java_steps(self, findings: Dict) -> List[Dict]:
-        steps = []
-        steps.append({
-            "id": "java_modernize",
-            "title": "Modernize Java code",
-            "description": "Use var for local variables, switch expressions, text blocks",
-            "files_affected": findings["languages"].get("java", [])[:5],
-            "estimated_loc": 150,
-            "risk": "medium"
-        })
-        return steps
+        return [_java_modernize_step(findings)]
 
     def _golang_steps(self, findings: Dict) -> List[Dict]:
-        steps = []
-        steps.append({
-            "id": "go_modules",
-            "title": "Update Go dependencies",
-            "description": "Update go.mod dependencies to latest versions",
-            "files_affected": ["go.mod", "go.sum"],
-            "estimated_loc": 10,
-            "risk": "medium"
-        })
-        return steps
+        return [_go_modules_step()]
 
-    def _estimate_loc_changes(self) -> int:
-        total_files = sum(len(files) for files in self.analyzer._detect_languages().values())
+    def _estimate_loc_changes(self, findings: Dict) -> int:
+        total_files = sum(len(files) for files in findings["languages"].values())
         return min(total_files * 20, 500)
 
-    def _assess_risk(self) -> str:
-        issue_count = len(self.analyzer._detect_outdated_issues())
-        if issue_count > 10:
-            return "high"
-        elif issue_count > 5:
-            return "medium"
-        else:
-            return "low"
+    def _assess_risk(self, findings: Dict) -> str:
+        issue_count = len(findings["outdated_issues"])
+        return next((level for threshold, level in _RISK_THRESHOLDS if issue_count > threshold), "low")
+
+    def _analyze_incremental(self, files: List[str], stats: Dict[str, os.stat_result]) -> Dict:
+        """Analyze the service, re-scanning only files whose content changed since the last run.
+
+        ``files`` and ``stats`` come from ``list_files()``. Per-file results are
+        kept in a SQLite database under ``$XDG_CACHE_HOME/modx/analysis`` (one
+        per service, never inside the service tree), keyed by path, with
+        mtime/size as a cheap first check and SHA-256 to confirm real changes.
+        """
+        languages, candidates, total_files = select_files(files)
+
+        self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(str(self._cache_path))) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files "
+                "(path TEXT PRIMARY KEY, mtime REAL, size INTEGER, sha256 BLOB, lang TEXT, issues_json BLOB)"
+            )
+            cached = {row[0]: row[1:] for row in conn.execute("SELECT path, mtime, size, sha256, issues_json FROM files")}
+
+            issues_by_file: Dict[str, List[Dict]] = {}
+            changed = []
+            rows = []
+            for rel in candidates:
+                full_path = self.service_path / rel
+                st = stats[rel]
+                hit = cached.get(rel)
+                if hit and hit[0] == st.st_mtime and hit[1] == st.st_size:
+                    issues_by_file[rel] = json.loads(hit[3])
+                    continue
+                digest = hashlib.sha256(full_path.read_bytes()).digest()
+                if hit and hit[2] == digest:
+                    issues_by_file[rel] = json.loads(hit[3])
+                else:
+                    changed.append(rel)
+                lang = "json" if rel == "package.json" else "python"
+                rows.append([rel, st.st_mtime, st.st_size, digest, lang, None])
+
+            issues_by_file.update(self.analyzer.analyze_files(changed))
+            for row in rows:
+                row[5] = json.dumps(issues_by_file[row[0]]).encode("utf-8")
+
+            stale = [(rel,) for rel in cached if rel not in issues_by_file]
+            conn.executemany("DELETE FROM files WHERE path = ?", stale)
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+
+        outdated_issues = [issue for rel in candidates for issue in issues_by_file[rel]]
+        return self.analyzer.assemble_findings(languages, self.analyzer._detect_frameworks(), outdated_issues, total_files)
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+from modx._patch import apply_unified
+
+
+def test_pure_insertion_goes_after_old_start(tmp_path: Path):
+    (tmp_path / "f.txt").write_text("a\nb\nc\nd\ne\n")
+    diff = "--- a/f.txt\n+++ b/f.txt\n@@ -2,0 +3 @@\n+X\n"
+
+    ok, new_files = apply_unified(diff, tmp_path)
+
+    assert ok
+    assert (tmp_path / "f.txt").read_text() == "a\nb\nX\nc\nd\ne\n"
+    assert new_files == {"f.txt": "a\nb\nX\nc\nd\ne\n"}
+
+
+def test_insertion_at_start_of_file(tmp_path: Path):
+    (tmp_path / "f.txt").write_text("a\nb\n")
+    diff = "--- a/f.txt\n+++ b/f.txt\n@@ -0,0 +1 @@\n+X\n"
+
+    ok, _ = apply_unified(diff, tmp_path)
+
+    assert ok
+    assert (tmp_path / "f.txt").read_text() == "X\na\nb\n"
+
+
+def test_trailing_blank_line_after_hunk_is_ignored(tmp_path: Path):
+    (tmp_path / "f.txt").write_text("a\nb\nc\n")
+    diff = "--- a/f.txt\n+++ b/f.txt\n@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n\n"
+
+    ok, _ = apply_unified(diff, tmp_path)
+
+    assert ok
+    assert (tmp_path / "f.txt").read_text() == "a\nB\nc\n"
+
+
+def test_ai_diffs_apply_as_one_batch(tmp_path: Path, monkeypatch):
+    from modx.core.migrators import base
+
+    svc = tmp_path / "svc"
+    work = tmp_path / "work"
+    for root in (svc, work):
+        root.mkdir()
+        (root / "a.py").write_text("x = 1\n")
+        (root / "b.py").write_text("y = 2\n")
+    diffs = [
+        ("a.py", "--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x = 1\n+x = 10\n"),
+        ("b.py", "--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n-y = 2\n+y = 20\n"),
+    ]
+    calls = []
+
+    def counting_apply(diff_text, root, check_only=False):
+        calls.append(diff_text)
+        return apply_unified(diff_text, root, check_only)
+
+    monkeypatch.setattr(base, "apply_unified", counting_apply)
+    migrator = base.CodeMigrator(str(svc))
+    changes = []
+
+    assert migrator._apply_ai_diffs("fix", diffs, work, changes)
+    assert len(calls) == 1
+    assert (work / "a.py").read_text() == "x = 10\n"
+    assert (work / "b.py").read_text() == "y = 20\n"
+    assert sorted(c["file"] for c in changes) == ["a.py", "b.py"]
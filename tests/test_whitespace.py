@@ -0,0 +1,19 @@
+from modx.core.migrators.base import _space_top_level_defs
+
+
+def test_top_level_defs_get_two_blank_lines():
+    text = "x = 1\ndef f():\n    pass\n\ndef g():\n    pass\n"
+
+    assert _space_top_level_defs(text) == "x = 1\n\n\ndef f():\n    pass\n\n\ndef g():\n    pass\n"
+
+
+def test_unchanged_text_is_returned_as_is():
+    text = "x = 1\n\n\ndef f():\n    pass\n"
+
+    assert _space_top_level_defs(text) is text
+
+
+def test_crlf_files_keep_crlf_line_endings():
+    text = "x = 1\r\ndef f():\r\n    pass\r\n\r\ndef g():\r\n    pass"
+
+    assert _space_top_level_defs(text) == "x = 1\r\n\r\n\r\ndef f():\r\n    pass\r\n\r\n\r\ndef g():\r\n    pass\r\n"